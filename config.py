@@ -18,9 +18,13 @@ def get_config():
     if not os.path.exists(temp_dir):
         os.makedirs(temp_dir, exist_ok=True)
 
+    # memory budget of the segmentation undo history
+    undo_memory_mb = int(os.getenv('undo_memory_mb', 64))
+
     ret = {
         'log_dir': log_dir,
-        'temp_dir': temp_dir
+        'temp_dir': temp_dir,
+        'undo_memory_mb': undo_memory_mb
     }
 
     print('get_config().return=', ret)
@@ -5,9 +5,8 @@ def rot90(sitk_image, plus: bool):
 
     image = sitk_image
 
-    # Convert to NumPy array while preserving data type
-    pixel_type = image.GetPixelID()  # Get original pixel type
-    image_array = sitk.GetArrayFromImage(image)
+    # NumPy view of the pixel buffer (no copy); the data type is preserved
+    image_array = sitk.GetArrayViewFromImage(image)
     origin = image.GetOrigin()
     spacing = image.GetSpacing()
     direction = image.GetDirection()
@@ -18,9 +17,8 @@ def rot90(sitk_image, plus: bool):
     else: # y axis to x
         rotated_array = np.rot90(image_array, k=1, axes=(1, 2))
 
-    # Convert back to SimpleITK image with the same pixel type
-    rotated_image = sitk.GetImageFromArray(rotated_array)
-    rotated_image = sitk.Cast(rotated_image, pixel_type)  # Ensure same pixel type
+    # Convert back to SimpleITK image (the only copy) with the same pixel type
+    rotated_image = sitk.GetImageFromArray(rotated_array, isVector=image.GetNumberOfComponentsPerPixel() > 1)
 
     # Keep metadata unchanged
     rotated_image.SetOrigin(origin)
@@ -43,16 +41,14 @@ def flip(sitk_image, axis):
     """
     Flip a SimpleITK image along the x-axis.
     """
-    # Convert to NumPy array
-    pixel_type = sitk_image.GetPixelID()
-    image_array = sitk.GetArrayFromImage(sitk_image)
+    # NumPy view of the pixel buffer (no copy)
+    image_array = sitk.GetArrayViewFromImage(sitk_image)
     
     # Flip along the x-axis (axis=1)
     flipped_array = np.flip(image_array, axis)
 
-    # Convert back to SimpleITK image
-    flipped_image = sitk.GetImageFromArray(flipped_array)
-    flipped_image = sitk.Cast(flipped_image, pixel_type)  # Preserve pixel type
+    # Convert back to SimpleITK image (the only copy), the pixel type is preserved
+    flipped_image = sitk.GetImageFromArray(flipped_array, isVector=sitk_image.GetNumberOfComponentsPerPixel() > 1)
 
     # Preserve metadata (origin, spacing, direction)
     origin = sitk_image.GetOrigin()
@@ -147,6 +143,61 @@ def convert_single_slice_3d_image_to_2d_image(image_3d):
         return image_2d
     else:
         raise Exception(f'Not a single-slice 3D image')
+
+def connected_threshold(array, seed, lower, upper):
+    """
+    Boolean mask of the pixels of a 2D (row=y, col=x) numpy array that are connected to seed (x, y) through pixels
+    with values in [lower, upper] (face connectivity, so diagonal gaps do not leak).
+    """
+    image = sitk.GetImageFromArray(np.ascontiguousarray(array))
+    region = sitk.ConnectedThreshold(image, seedList=[(int(seed[0]), int(seed[1]))], lower=float(lower), upper=float(upper), replaceValue=1)
+    return sitk.GetArrayFromImage(region) != 0
+
+def grow_region(intensity, seed, lower, upper, initial_size=256):
+    """
+    Region growing from seed (x, y): the pixels of a 2D intensity array connected to the seed with values in [lower, upper].
+
+    The region is first grown in an initial_size neighborhood of the seed, which is doubled only while the region
+    touches a side of the neighborhood that is not the image border. Returns (region (y_slice, x_slice), mask of region).
+    """
+    height, width = intensity.shape
+    x, y = int(seed[0]), int(seed[1])
+    half = initial_size // 2
+    while True:
+        y0, y1 = max(y - half, 0), min(y + half, height)
+        x0, x1 = max(x - half, 0), min(x + half, width)
+        mask = connected_threshold(intensity[y0:y1, x0:x1], (x - x0, y - y0), lower, upper)
+
+        clipped = (y0 > 0 and mask[0].any()) or (y1 < height and mask[-1].any()) or \
+                  (x0 > 0 and mask[:, 0].any()) or (x1 < width and mask[:, -1].any())
+        if not clipped:
+            return (slice(y0, y1), slice(x0, x1)), mask
+        half *= 2
+
+MORPHOLOGY_OPERATIONS = ("dilate", "erode", "open", "close", "fill_holes")
+
+def binary_morphology(mask, operation, radius=1):
+    """
+    Binary morphology on a 2D numpy mask (nonzero = foreground) with a ball kernel of radius (pixels).
+    operation: one of MORPHOLOGY_OPERATIONS. Returns a uint8 (0/1) numpy array.
+    """
+    image = sitk.GetImageFromArray((np.asarray(mask) != 0).astype(np.uint8))
+    kernel = (int(radius), int(radius))
+
+    if operation == "dilate":
+        result = sitk.BinaryDilate(image, kernelRadius=kernel, kernelType=sitk.sitkBall, foregroundValue=1)
+    elif operation == "erode":
+        result = sitk.BinaryErode(image, kernelRadius=kernel, kernelType=sitk.sitkBall, foregroundValue=1)
+    elif operation == "open":
+        result = sitk.BinaryMorphologicalOpening(image, kernelRadius=kernel, kernelType=sitk.sitkBall, foregroundValue=1)
+    elif operation == "close":
+        result = sitk.BinaryMorphologicalClosing(image, kernelRadius=kernel, kernelType=sitk.sitkBall, foregroundValue=1, safeBorder=True)
+    elif operation == "fill_holes":
+        result = sitk.BinaryFillhole(image, fullyConnected=False, foregroundValue=1)
+    else:
+        raise ValueError(f"Unknown morphology operation: {operation}")
+
+    return sitk.GetArrayFromImage(result)
     
 if __name__ == '__main__':
     import numpy as np
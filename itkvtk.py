@@ -1,6 +1,6 @@
 import vtk
 import SimpleITK as sitk
-from vtk.util.numpy_support import numpy_to_vtk
+from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy
 import numpy as np
 
 def numpy_dtype_to_vtk_type(dtype):
@@ -26,28 +26,31 @@ def numpy_dtype_to_vtk_type(dtype):
     else:
         raise ValueError(f"Unsupported dtype: {dtype}")
 
-def sitk_to_vtk(sitk_image):
-    """Convert a SimpleITK image to a VTK image."""
-    import numpy as np
-    from vtk.util.numpy_support import numpy_to_vtk
+def sitk_to_vtk(sitk_image, deep=False):
+    """Convert a SimpleITK image to a VTK image.
 
-    # Get the numpy array from SimpleITK
-    np_array = sitk.GetArrayFromImage(sitk_image)
+    By default the VTK image shares the pixel buffer of sitk_image (no copy). The VTK scalars
+    keep a reference to sitk_image, so the buffer stays valid as long as the VTK image is alive,
+    and edits through either side are seen by both. Pass deep=True to get an independent copy.
+    """
+    # View of the pixel buffer in (z, y, x[, c]) order
+    np_array = sitk.GetArrayViewFromImage(sitk_image)
     
-    # Get image dimensions and metadata
-    dims = sitk_image.GetSize()
-    spacing = sitk_image.GetSpacing()
-    origin = sitk_image.GetOrigin()
+    # Get image dimensions and metadata (2D images are given a single slice)
+    pad = 3 - sitk_image.GetDimension()
+    dims = tuple(sitk_image.GetSize()) + (1,) * pad
+    spacing = tuple(sitk_image.GetSpacing()) + (1.0,) * pad
+    origin = tuple(sitk_image.GetOrigin()) + (0.0,) * pad
     direction = sitk_image.GetDirection()
 
     # Create a VTK image
     vtk_image = vtk.vtkImageData()
-    vtk_image.SetDimensions(np_array.shape[::-1])  # Reverse dimensions to match VTK
+    vtk_image.SetDimensions(dims)
     vtk_image.SetSpacing(spacing)
     vtk_image.SetOrigin(origin)
 
     # Set the direction matrix if supported by VTK
-    if hasattr(vtk_image, "SetDirectionMatrix"):
+    if hasattr(vtk_image, "SetDirectionMatrix") and len(direction) == 9:
         vtk_matrix = vtk.vtkMatrix3x3()
         for i in range(3):
             for j in range(3):
@@ -57,14 +60,24 @@ def sitk_to_vtk(sitk_image):
     # Convert numpy array to VTK array
     vtk_type = numpy_dtype_to_vtk_type(np_array.dtype)
 
-    # Flatten the array with Fortran-order for VTK
-    vtk_array = numpy_to_vtk(np_array.ravel(order='C'), deep=True, array_type=vtk_type) 
+    # x varies fastest in both toolkits, so the C-order buffer is used as is
+    n_components = sitk_image.GetNumberOfComponentsPerPixel()
+    np_array = np_array.reshape(-1, n_components) if n_components > 1 else np_array.reshape(-1)
+    vtk_array = numpy_to_vtk(np_array, deep=deep, array_type=vtk_type) 
+    if not deep:
+        # the shallow array points into sitk_image's buffer, keep the image alive with it
+        vtk_array._sitk_image = sitk_image
     vtk_image.GetPointData().SetScalars(vtk_array)
 
     return vtk_image
 
-def vtk_to_sitk(vtk_image):
-    """Convert vtkImageData to SimpleITK Image."""
+def vtk_to_sitk(vtk_image, orientation=None):
+    """Convert vtkImageData to SimpleITK Image.
+
+    The scalars are read through a numpy view; SimpleITK does not adopt external buffers,
+    so GetImageFromArray makes the one (unavoidable) copy.
+    If an orientation.Orientation is given, the pixels are rotated/flipped into it during that copy.
+    """
     # Get the dimensions, spacing, and origin of the VTK image
     dims = vtk_image.GetDimensions()
     spacing = vtk_image.GetSpacing()
@@ -75,13 +88,21 @@ def vtk_to_sitk(vtk_image):
     if hasattr(vtk_image, "GetDirectionMatrix"):
         direction_matrix = vtk_image.GetDirectionMatrix()
 
-    # Extract the image scalars as a NumPy array
+    # Extract the image scalars as a NumPy view
     scalars = vtk_image.GetPointData().GetScalars()
-    np_array = vtk.util.numpy_support.vtk_to_numpy(scalars)
-    np_array = np_array.reshape(dims[::-1])  # Reshape to (z, y, x)
+    n_components = scalars.GetNumberOfComponents()
+    np_array = vtk_to_numpy(scalars)
+    if n_components > 1:
+        np_array = np_array.reshape(dims[::-1] + (n_components,))  # Reshape to (z, y, x, c)
+    else:
+        np_array = np_array.reshape(dims[::-1])  # Reshape to (z, y, x)
+
+    if orientation is not None and not orientation.is_identity():
+        np_array = orientation.materialize_array(np_array)
+        dims, spacing = orientation.materialize_geometry(dims, spacing)
 
     # Convert to a SimpleITK image
-    sitk_image = sitk.GetImageFromArray(np_array)
+    sitk_image = sitk.GetImageFromArray(np_array, isVector=n_components > 1)
     sitk_image.SetSpacing(spacing)
     sitk_image.SetOrigin(origin)
     if direction_matrix:
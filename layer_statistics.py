@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class LayerStatistics:
+    """
+    Area, centroid, bounding box and intensity statistics of a segmentation layer, kept up to date incrementally.
+
+    Only sums are stored (pixel count, coordinate and intensity moments, and the number of labeled pixels of each
+    row and column for the bounding box), so a change is applied by adding the pixels that were labeled and
+    subtracting the pixels that were cleared within the dirty region, without rescanning the image.
+    """
+    def __init__(self, shape):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.count = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_intensity = 0.0
+        self.sum_intensity2 = 0.0
+        self.row_counts = np.zeros(self.shape[0], dtype=np.int64)
+        self.col_counts = np.zeros(self.shape[1], dtype=np.int64)
+
+    @classmethod
+    def from_layer(cls, layer_data, intensity):
+        """Statistics of a layer (SegmentationItem), visiting only its labeled tiles. intensity: (y, x) base image view."""
+        statistics = cls(intensity.shape)
+        for region, mask in layer_data.iter_mask_tiles():
+            statistics.add(region, mask != 0, intensity, 1)
+        return statistics
+
+    def add(self, region, mask, intensity, sign):
+        """Add (sign=1) or subtract (sign=-1) the pixels of a boolean mask of region (y_slice, x_slice)."""
+        rows = np.count_nonzero(mask, axis=1)
+        n = int(rows.sum())
+        if n == 0:
+            return
+        cols = np.count_nonzero(mask, axis=0)
+
+        y0, x0 = region[0].start or 0, region[1].start or 0
+        values = intensity[region][mask].astype(np.float64)
+
+        self.count += sign * n
+        self.sum_y += sign * float(np.dot(rows, np.arange(y0, y0 + rows.size)))
+        self.sum_x += sign * float(np.dot(cols, np.arange(x0, x0 + cols.size)))
+        self.sum_intensity += sign * float(values.sum())
+        self.sum_intensity2 += sign * float(np.dot(values, values))
+        self.row_counts[y0:y0 + rows.size] += sign * rows
+        self.col_counts[x0:x0 + cols.size] += sign * cols
+
+    def update(self, region, before, after, intensity):
+        """Apply the change of the mask within region from before to after (arrays of the region shape)."""
+        before = before != 0
+        after = after != 0
+        self.add(region, after & ~before, intensity, 1)
+        self.add(region, before & ~after, intensity, -1)
+
+    def bounding_box(self):
+        """Bounding box of the labeled pixels as (y_slice, x_slice), or None if the layer is empty."""
+        rows = np.flatnonzero(self.row_counts)
+        if rows.size == 0:
+            return None
+        cols = np.flatnonzero(self.col_counts)
+        return (slice(int(rows[0]), int(rows[-1]) + 1), slice(int(cols[0]), int(cols[-1]) + 1))
+
+    def get_summary(self, spacing=(1.0, 1.0), origin=(0.0, 0.0)):
+        """A dict of the statistics, with the area in physical units and the centroid in world coordinates."""
+        summary = {
+            "count": self.count,
+            "area": self.count * spacing[0] * spacing[1],
+            "centroid": None,
+            "bounding_box": None,
+            "mean": None,
+            "std": None,
+        }
+        if self.count == 0:
+            return summary
+
+        mean = self.sum_intensity / self.count
+        summary["centroid"] = (origin[0] + spacing[0] * self.sum_x / self.count, origin[1] + spacing[1] * self.sum_y / self.count)
+        box = self.bounding_box()
+        summary["bounding_box"] = (box[1].start, box[0].start, box[1].stop - 1, box[0].stop - 1)  # x0, y0, x1, y1 (pixels)
+        summary["mean"] = mean
+        summary["std"] = float(np.sqrt(max(self.sum_intensity2 / self.count - mean * mean, 0.0)))
+        return summary
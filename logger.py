@@ -36,6 +36,26 @@ console_handler.setLevel(logging.INFO)
 console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
+# Trace facility for interactive hot paths (mouse move, painting, dragging).
+# Disabled by default and toggled at runtime with set_trace_level(). Messages take %-style args,
+# so a disabled trace() costs a single level check and no string formatting.
+# Trace messages are logged through "app_logger.trace" (the log file gets all levels, the console INFO and above).
+trace_logger = logging.getLogger("app_logger.trace")
+_trace_level = None  # None: tracing is disabled
+
+def set_trace_level(level):
+    """Enable tracing of messages at level and above (e.g. logging.DEBUG), or disable it with None."""
+    global _trace_level
+    _trace_level = level
+
+def is_trace_enabled(level=logging.DEBUG):
+    return _trace_level is not None and level >= _trace_level
+
+def trace(msg, *args, level=logging.DEBUG):
+    if _trace_level is None or level < _trace_level:
+        return
+    trace_logger.log(level, msg, *args)
+
 # Function to log an exception
 def log_exception(e):
     logger.error("Exception occurred", exc_info=e)
@@ -0,0 +1,135 @@
+import numpy as np
+from functools import lru_cache
+
+
+def ellipse_stencil(radius_x, radius_y):
+    """
+    Boolean ellipse mask of shape (2*radius_y+1, 2*radius_x+1), centered on the middle pixel.
+    A pixel (i, j) relative to the center is inside if (i/radius_x)**2 + (j/radius_y)**2 <= 1.
+    """
+    i = np.arange(-radius_x, radius_x + 1) / radius_x
+    j = np.arange(-radius_y, radius_y + 1) / radius_y
+    return (i[np.newaxis, :] ** 2 + j[:, np.newaxis] ** 2) <= 1.0
+
+
+@lru_cache(maxsize=64)
+def get_brush_stencil(radius_x, radius_y, shape="ellipse"):
+    """
+    Return the (cached) boolean brush mask for the given radius in pixels.
+    The returned array is shared between callers, so it is read-only.
+    """
+    if shape == "ellipse":
+        stencil = ellipse_stencil(radius_x, radius_y)
+    else:
+        raise ValueError(f"Unsupported brush shape: {shape}")
+
+    stencil.flags.writeable = False
+    return stencil
+
+
+def intensity_gate(window, region):
+    """Boolean mask of the pixels within region whose intensity is in the window (intensity array, lower, upper)."""
+    intensity, lower, upper = window
+    values = intensity[region]
+    return (values >= lower) & (values <= upper)
+
+
+def stamp(array, stencil, x, y, value, window=None):
+    """
+    Apply a boolean stencil centered at (x, y) on a 2D (row=y, col=x) array in place.
+    The stencil is clipped to the array bounds and written with a single slice assignment.
+    If window (intensity array of the array shape, lower, upper) is given, only the pixels with an intensity
+    in [lower, upper] are written.
+
+    Returns the touched region as (y_slice, x_slice), or None if the stencil is fully outside.
+    """
+    height, width = array.shape
+    ry = stencil.shape[0] // 2
+    rx = stencil.shape[1] // 2
+
+    x0, x1 = max(x - rx, 0), min(x + rx + 1, width)
+    y0, y1 = max(y - ry, 0), min(y + ry + 1, height)
+    if x0 >= x1 or y0 >= y1:
+        return None
+
+    clipped = stencil[y0 - (y - ry):y1 - (y - ry), x0 - (x - rx):x1 - (x - rx)]
+    region = (slice(y0, y1), slice(x0, x1))
+    if window is not None:
+        clipped = clipped & intensity_gate(window, region)
+    array[region][clipped] = value
+
+    return region
+
+
+def stroke_region(shape, radius_x, radius_y, x0, y0, x1, y1):
+    """
+    The region (y_slice, x_slice) that a stroke of an ellipse brush from (x0, y0) to (x1, y1) can touch on an array
+    of shape (rows, cols), clipped to the array. None if it is fully outside.
+    """
+    height, width = shape
+
+    bx0, bx1 = max(min(x0, x1) - radius_x, 0), min(max(x0, x1) + radius_x + 1, width)
+    by0, by1 = max(min(y0, y1) - radius_y, 0), min(max(y0, y1) + radius_y + 1, height)
+    if bx0 >= bx1 or by0 >= by1:
+        return None
+
+    return (slice(by0, by1), slice(bx0, bx1))
+
+
+def stroke(array, radius_x, radius_y, x0, y0, x1, y1, value, window=None):
+    """
+    Rasterize the area swept by an ellipse brush moving from (x0, y0) to (x1, y1) on a 2D array in place.
+    Scaling by the brush radius turns the ellipse into a unit circle, so the swept area is a capsule:
+    every pixel within distance 1 of the (scaled) segment. This is computed in one vectorized pass
+    over the clipped bounding box of the stroke, leaving no gaps between the two positions.
+    window (intensity array, lower, upper) gates the written pixels as in stamp().
+
+    Returns the touched region as (y_slice, x_slice), or None if the stroke is fully outside.
+    """
+    region = stroke_region(array.shape, radius_x, radius_y, x0, y0, x1, y1)
+    if region is None:
+        return None
+    by0, by1 = region[0].start, region[0].stop
+    bx0, bx1 = region[1].start, region[1].stop
+
+    # pixel positions relative to the start point, in units of the brush radius
+    px = (np.arange(bx0, bx1)[np.newaxis, :] - x0) / radius_x
+    py = (np.arange(by0, by1)[:, np.newaxis] - y0) / radius_y
+
+    # stroke direction in the same units
+    dx = (x1 - x0) / radius_x
+    dy = (y1 - y0) / radius_y
+    length2 = dx * dx + dy * dy
+
+    # parameter of the closest point on the segment
+    if length2 > 0:
+        t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0)
+    else:
+        t = 0.0
+
+    inside = (px - t * dx) ** 2 + (py - t * dy) ** 2 <= 1.0
+    if window is not None:
+        inside &= intensity_gate(window, region)
+
+    array[region][inside] = value
+
+    return region
+
+
+def bounding_box(array):
+    """
+    Bounding box of the nonzero pixels of a 2D array as (y_slice, x_slice), or None if the array is empty.
+    Rows and columns are reduced separately, so no index arrays of the pixels are built.
+    """
+    rows = np.flatnonzero(array.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(array[rows[0]:rows[-1] + 1].any(axis=0))
+
+    return (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+
+
+def pad_region(region, pad, shape):
+    """Grow a region (y_slice, x_slice) by pad pixels on each side, clipped to shape (rows, cols)."""
+    return (slice(max(region[0].start - pad, 0), min(region[0].stop + pad, shape[0])),
+            slice(max(region[1].start - pad, 0), min(region[1].stop + pad, shape[1])))
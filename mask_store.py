@@ -0,0 +1,202 @@
+import numpy as np
+
+# number of set bits of each byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def normalize_region(region, shape):
+    """Return region (y_slice, x_slice; None for the whole array) as (y0, y1, x0, x1) bounds clipped to a 2D shape."""
+    if region is None:
+        return 0, shape[0], 0, shape[1]
+    y0, y1, _ = region[0].indices(shape[0])
+    x0, x1, _ = region[1].indices(shape[1])
+    return y0, max(y0, y1), x0, max(x0, x1)
+
+
+class PackedMaskStore:
+    """
+    A 2D binary mask stored with 1 bit per pixel (np.packbits along x, one byte holds 8 pixels of a row).
+
+    Regions (y_slice, x_slice) are read and written by unpacking only the bytes that cover the region,
+    so painting a small area does not touch the rest of the mask. Nonzero values are stored as 1.
+    """
+    def __init__(self, shape):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.packed = np.zeros((self.shape[0], (self.shape[1] + 7) // 8), dtype=np.uint8)
+
+    @classmethod
+    def from_dense(cls, array):
+        store = cls(array.shape)
+        store.packed = np.packbits(array != 0, axis=1)
+        return store
+
+    def to_dense(self, out=None):
+        """Unpack the whole mask to a uint8 (0/1) array, into out if given."""
+        dense = np.unpackbits(self.packed, axis=1, count=self.shape[1])
+        if out is None:
+            return dense
+        out[...] = dense
+        return out
+
+    def __getitem__(self, region):
+        """uint8 (0/1) copy of the mask within region."""
+        y0, y1, x0, x1 = normalize_region(region, self.shape)
+        b0, b1 = x0 // 8, (x1 + 7) // 8
+        bits = np.unpackbits(self.packed[y0:y1, b0:b1], axis=1)
+        return bits[:, x0 - b0 * 8:x1 - b0 * 8]
+
+    def __setitem__(self, region, values):
+        """Write values (nonzero -> 1; an array of the region shape, or a scalar) within region."""
+        y0, y1, x0, x1 = normalize_region(region, self.shape)
+        if y0 >= y1 or x0 >= x1:
+            return
+
+        # unpack the bytes covering the region, so the pixels sharing these bytes are kept
+        b0, b1 = x0 // 8, (x1 + 7) // 8
+        bits = np.unpackbits(self.packed[y0:y1, b0:b1], axis=1)
+        bits[:, x0 - b0 * 8:x1 - b0 * 8] = np.asarray(values) != 0
+        self.packed[y0:y1, b0:b1] = np.packbits(bits, axis=1)
+
+    def count(self):
+        """Number of set pixels."""
+        return int(_POPCOUNT[self.packed].sum())
+
+    def bounding_box(self):
+        """Bounding box of the set pixels as (y_slice, x_slice), or None if the mask is empty."""
+        rows = np.flatnonzero(self.packed.any(axis=1))
+        if rows.size == 0:
+            return None
+
+        # OR of the rows in range gives the occupied columns
+        columns = np.unpackbits(np.bitwise_or.reduce(self.packed[rows[0]:rows[-1] + 1], axis=0), count=self.shape[1])
+        cols = np.flatnonzero(columns)
+        return (slice(int(rows[0]), int(rows[-1]) + 1), slice(int(cols[0]), int(cols[-1]) + 1))
+
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def copy(self):
+        store = PackedMaskStore(self.shape)
+        store.packed = self.packed.copy()
+        return store
+
+
+class TiledMaskStore:
+    """
+    A sparse 2D binary mask made of tile_size x tile_size tiles. Only tiles with set pixels are allocated,
+    each as a PackedMaskStore (1 bit per pixel), so memory and tile iteration scale with the labeled area.
+
+    Same region API as PackedMaskStore (mask[region], mask[region] = values, count(), bounding_box(), to_dense()),
+    plus iter_tiles() to visit the occupied tiles only.
+    """
+    def __init__(self, shape, tile_size=64):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.tile_size = tile_size
+        self.tiles = {}  # (tile_y, tile_x) -> PackedMaskStore
+
+    @classmethod
+    def from_dense(cls, array, tile_size=64):
+        store = cls(array.shape, tile_size)
+
+        # occupancy of each tile, reduced without padding the array
+        mask = array != 0
+        occupied = np.logical_or.reduceat(mask, np.arange(0, mask.shape[0], tile_size), axis=0)
+        occupied = np.logical_or.reduceat(occupied, np.arange(0, mask.shape[1], tile_size), axis=1)
+
+        for ty, tx in np.argwhere(occupied):
+            y0, y1, x0, x1 = store.get_tile_bounds(ty, tx)
+            tile = PackedMaskStore((tile_size, tile_size))
+            tile[0:y1 - y0, 0:x1 - x0] = mask[y0:y1, x0:x1]
+            store.tiles[(int(ty), int(tx))] = tile
+        return store
+
+    def get_tile_bounds(self, ty, tx):
+        """(y0, y1, x0, x1) of a tile, clipped to the mask."""
+        y0, x0 = ty * self.tile_size, tx * self.tile_size
+        return y0, min(y0 + self.tile_size, self.shape[0]), x0, min(x0 + self.tile_size, self.shape[1])
+
+    def iter_tiles(self):
+        """Yield (region, uint8 mask) of the occupied tiles, region being (y_slice, x_slice) in mask coordinates."""
+        for (ty, tx), tile in sorted(self.tiles.items()):
+            y0, y1, x0, x1 = self.get_tile_bounds(ty, tx)
+            yield (slice(y0, y1), slice(x0, x1)), tile[0:y1 - y0, 0:x1 - x0]
+
+    def to_dense(self, out=None):
+        if out is None:
+            out = np.zeros(self.shape, dtype=np.uint8)
+        else:
+            out[...] = 0
+        for region, tile in self.iter_tiles():
+            out[region] = tile
+        return out
+
+    def iter_overlapping_tiles(self, y0, y1, x0, x1):
+        """Yield (ty, tx) and the intersection bounds of all tile positions (allocated or not) overlapping the bounds."""
+        ts = self.tile_size
+        for ty in range(y0 // ts, (y1 - 1) // ts + 1):
+            for tx in range(x0 // ts, (x1 - 1) // ts + 1):
+                ty0, ty1, tx0, tx1 = self.get_tile_bounds(ty, tx)
+                yield ty, tx, max(y0, ty0), min(y1, ty1), max(x0, tx0), min(x1, tx1)
+
+    def __getitem__(self, region):
+        """uint8 (0/1) copy of the mask within region."""
+        y0, y1, x0, x1 = normalize_region(region, self.shape)
+        out = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        if y0 >= y1 or x0 >= x1:
+            return out
+
+        for ty, tx, iy0, iy1, ix0, ix1 in self.iter_overlapping_tiles(y0, y1, x0, x1):
+            tile = self.tiles.get((ty, tx))
+            if tile is not None:
+                ty0, tx0 = ty * self.tile_size, tx * self.tile_size
+                out[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = tile[iy0 - ty0:iy1 - ty0, ix0 - tx0:ix1 - tx0]
+        return out
+
+    def __setitem__(self, region, values):
+        """Write values (nonzero -> 1; an array of the region shape, or a scalar) within region. Tiles are allocated
+        when pixels are set in them and released when they become empty."""
+        y0, y1, x0, x1 = normalize_region(region, self.shape)
+        if y0 >= y1 or x0 >= x1:
+            return
+        values = np.broadcast_to(np.asarray(values) != 0, (y1 - y0, x1 - x0))
+
+        for ty, tx, iy0, iy1, ix0, ix1 in self.iter_overlapping_tiles(y0, y1, x0, x1):
+            sub = values[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0]
+            tile = self.tiles.get((ty, tx))
+            if tile is None:
+                if not sub.any():
+                    continue
+                tile = self.tiles[(ty, tx)] = PackedMaskStore((self.tile_size, self.tile_size))
+
+            ty0, tx0 = ty * self.tile_size, tx * self.tile_size
+            tile[iy0 - ty0:iy1 - ty0, ix0 - tx0:ix1 - tx0] = sub
+            if not sub.any() and not tile.packed.any():
+                del self.tiles[(ty, tx)]
+
+    def count(self):
+        return sum(tile.count() for tile in self.tiles.values())
+
+    def bounding_box(self):
+        """Bounding box of the set pixels as (y_slice, x_slice), or None if the mask is empty."""
+        bounds = None
+        for (ty, tx), tile in self.tiles.items():
+            box = tile.bounding_box()
+            if box is None:
+                continue
+            y0, x0 = ty * self.tile_size, tx * self.tile_size
+            box = (y0 + box[0].start, y0 + box[0].stop, x0 + box[1].start, x0 + box[1].stop)
+            bounds = box if bounds is None else (
+                min(bounds[0], box[0]), max(bounds[1], box[1]), min(bounds[2], box[2]), max(bounds[3], box[3]))
+
+        if bounds is None:
+            return None
+        return (slice(bounds[0], bounds[1]), slice(bounds[2], bounds[3]))
+
+    def nbytes(self):
+        return sum(tile.nbytes() for tile in self.tiles.values())
+
+    def copy(self):
+        """An independent copy (only the allocated tiles are copied)."""
+        store = TiledMaskStore(self.shape, self.tile_size)
+        store.tiles = {key: tile.copy() for key, tile in self.tiles.items()}
+        return store
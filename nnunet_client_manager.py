@@ -251,13 +251,16 @@ class nnUNetDatasetManager(QObject):
 
             # get vtk image and label list
             vtk_image = self.segmentation_list_manager.get_base_vtk_image()
-            vtk_label_list = self.segmentation_list_manager.get_segmentation_vtk_images()
 
-            # combine the labels 
+            # combine the labels (built from the labeled tiles of each layer)
+            vtk_labels = self.segmentation_list_manager.create_label_image()
+
+            # the images are exported in the displayed orientation
+            orientation = self.segmentation_list_manager.get_vtk_viewer().orientation
+
             from itkvtk import vtk_to_sitk
-            sitk_label_list = [vtk_to_sitk(vtk_label) for vtk_label in vtk_label_list]
-            from itk import combine_sitk_labels, save_sitk_image
-            sitk_labels = combine_sitk_labels(sitk_label_list)
+            from itk import save_sitk_image
+            sitk_labels = vtk_to_sitk(vtk_labels, orientation)
 
             # save the files to a temporary folders
             temp_dir = conf['temp_dir']
@@ -269,7 +272,7 @@ class nnUNetDatasetManager(QObject):
 
             print(f'saving image to {image_path}')
             #save_as_2d_if_single_slice_3d_image=False, in nnunet everything is 3d. so, no need to save as 2d
-            save_sitk_image(vtk_to_sitk(vtk_image), image_path, save_as_2d_if_single_slice_3d_image=False)
+            save_sitk_image(vtk_to_sitk(vtk_image, orientation), image_path, save_as_2d_if_single_slice_3d_image=False)
             
             print(f'saving labels to {labels_path}')
             #save_as_2d_if_single_slice_3d_image=False, in nnunet everything is 3d. so, no need to save as 2d
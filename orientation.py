@@ -0,0 +1,110 @@
+import numpy as np
+import vtk
+
+# Orientation operations (in the xy plane of the image)
+ROT_PLUS_90 = "rot+90"    # x axis to y
+ROT_MINUS_90 = "rot-90"   # y axis to x
+FLIP_X = "flip_x"
+FLIP_Y = "flip_y"
+
+OPERATIONS = (ROT_PLUS_90, ROT_MINUS_90, FLIP_X, FLIP_Y)
+
+# Linear part of each operation, acting on (x, y)
+OPERATION_MATRICES = {
+    ROT_PLUS_90: ((0, -1), (1, 0)),
+    ROT_MINUS_90: ((0, 1), (-1, 0)),
+    FLIP_X: ((-1, 0), (0, 1)),
+    FLIP_Y: ((1, 0), (0, -1)),
+}
+
+def transform_array(array, operation):
+    """Return a (z, y, x[, c]) array rotated or flipped in the xy plane. The result is a NumPy view, no pixels are copied."""
+    if operation == ROT_PLUS_90:
+        return np.rot90(array, k=-1, axes=(1, 2))
+    elif operation == ROT_MINUS_90:
+        return np.rot90(array, k=1, axes=(1, 2))
+    elif operation == FLIP_X:
+        return np.flip(array, axis=2)
+    elif operation == FLIP_Y:
+        return np.flip(array, axis=1)
+    raise ValueError(f"Unknown orientation operation: {operation}")
+
+def transform_geometry(dims, spacing, operation):
+    """Dimensions and spacing after the operation (the origin is kept, as in itk.rot90/flip)."""
+    if operation in (ROT_PLUS_90, ROT_MINUS_90):
+        return (dims[1], dims[0], dims[2]), (spacing[1], spacing[0], spacing[2])
+    return tuple(dims), tuple(spacing)
+
+
+class Orientation:
+    """
+    Display orientation of the image: one of the 8 rotations by 90 degrees and flips of the xy plane.
+
+    Operations are composed on a 2x2 integer matrix (O(1), no pixels are touched). The viewer applies it at display time
+    through the camera model transform, so the image, the layers and the annotations keep their data coordinates.
+    Pixels are only reordered when an oriented copy is needed, with materialize_array().
+    """
+    def __init__(self, matrix=((1, 0), (0, 1))):
+        self.matrix = np.array(matrix, dtype=int)
+
+    def apply(self, operation):
+        """Return the orientation after applying operation to the displayed image."""
+        return Orientation(np.array(OPERATION_MATRICES[operation]) @ self.matrix)
+
+    def is_identity(self):
+        return np.array_equal(self.matrix, np.eye(2, dtype=int))
+
+    def __eq__(self, other):
+        return isinstance(other, Orientation) and np.array_equal(self.matrix, other.matrix)
+
+    def transform_vector(self, vector):
+        """Map a world (data) direction to the displayed direction (z is unchanged)."""
+        x, y = self.matrix @ np.array(vector[:2], dtype=float)
+        return [x, y, vector[2]]
+
+    def get_model_transform(self, center):
+        """vtkMatrix4x4 applying the orientation about center (world), for vtkCamera.SetModelTransformMatrix()."""
+        m = vtk.vtkMatrix4x4()
+        for i in range(2):
+            for j in range(2):
+                m.SetElement(i, j, float(self.matrix[i, j]))
+
+        # keep the center fixed: t = c - D c
+        translation = np.array(center[:2], dtype=float) - self.matrix @ np.array(center[:2], dtype=float)
+        m.SetElement(0, 3, translation[0])
+        m.SetElement(1, 3, translation[1])
+        return m
+
+    def to_operations(self):
+        """The operations (applied in order) that produce this orientation from the identity: an optional flip_x, then rotations."""
+        flip = round(np.linalg.det(self.matrix)) < 0
+        matrix = self.matrix @ np.array(OPERATION_MATRICES[FLIP_X]) if flip else self.matrix
+
+        rot = np.eye(2, dtype=int)
+        for k in range(4):
+            if np.array_equal(rot, matrix):
+                break
+            rot = np.array(OPERATION_MATRICES[ROT_PLUS_90]) @ rot
+
+        operations = [FLIP_X] if flip else []
+        operations += [ROT_MINUS_90] if k == 3 else [ROT_PLUS_90] * k
+        return operations
+
+    def materialize_array(self, array):
+        """Return the oriented (z, y, x[, c]) array as a view (np.ascontiguousarray() it if a buffer is needed)."""
+        for operation in self.to_operations():
+            array = transform_array(array, operation)
+        return array
+
+    def materialize_geometry(self, dims, spacing):
+        """Dimensions and spacing of the materialized image."""
+        for operation in self.to_operations():
+            dims, spacing = transform_geometry(dims, spacing, operation)
+        return tuple(dims), tuple(spacing)
+
+    def to_list(self):
+        return self.matrix.tolist()
+
+    @staticmethod
+    def from_list(matrix):
+        return Orientation(matrix) if matrix is not None else Orientation()
@@ -0,0 +1,112 @@
+import vtk
+import numpy as np
+
+from vtk_tools import get_numpy_view
+
+
+class SegmentationCompositor:
+    """
+    Renders all segmentation layers through a single actor.
+
+    The layers are packed into one uint8 label map (each layer owns a label value, and the top-most visible layer
+    wins where layers overlap). The label map is colored by a 256-entry lookup table that holds the color, alpha
+    and visibility of each layer, so a color or alpha change is a lookup table edit only. Hiding/showing a layer
+    is a lookup table edit too, unless the layer overlaps other layers: then its bounding box is re-packed.
+    """
+    MAX_LAYERS = 255
+
+    def __init__(self, reference_image):
+        # label map with the geometry of the reference (base) image
+        self.label_image = vtk.vtkImageData()
+        self.label_image.SetDimensions(reference_image.GetDimensions())
+        self.label_image.SetSpacing(reference_image.GetSpacing())
+        self.label_image.SetOrigin(reference_image.GetOrigin())
+        self.label_image.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 1)
+        self.label_image.GetPointData().GetScalars().Fill(0)
+
+        if hasattr(self.label_image, 'SetDirectionMatrix'):
+            self.label_image.SetDirectionMatrix(reference_image.GetDirectionMatrix())
+
+        # label 0 is the (transparent) background
+        self.lut = vtk.vtkLookupTable()
+        self.lut.SetNumberOfTableValues(self.MAX_LAYERS + 1)
+        self.lut.SetTableRange(0, self.MAX_LAYERS)
+        for label in range(self.MAX_LAYERS + 1):
+            self.lut.SetTableValue(label, 0.0, 0.0, 0.0, 0.0)
+
+        self.actor = vtk.vtkImageActor()
+        self.actor.GetMapper().SetInputData(self.label_image)
+        self.actor.GetProperty().SetLookupTable(self.lut)
+        self.actor.GetProperty().UseLookupTableScalarRangeOn()
+        self.actor.GetProperty().SetInterpolationTypeToNearest()  # label values must not be blended
+
+        self.labels = {}     # layer (SegmentationItem) -> label value
+        self.visible = {}    # layer -> visibility that is currently packed in the label map
+
+    def get_actor(self):
+        return self.actor
+
+    def add_layer(self, layer_data):
+        """Assign a label value to a layer and set its lookup table entry. Returns False if all labels are in use."""
+        used = set(self.labels.values())
+        free = [label for label in range(1, self.MAX_LAYERS + 1) if label not in used]
+        if not free:
+            return False
+
+        self.labels[layer_data] = free[0]
+        self.visible[layer_data] = layer_data.visible
+        self.update_lut_entry(layer_data)
+        return True
+
+    def remove_layer(self, layer_data):
+        """Release the label value of a layer (re-pack its region with composite() afterwards)."""
+        label = self.labels.pop(layer_data, None)
+        self.visible.pop(layer_data, None)
+        if label is not None:
+            self.lut.SetTableValue(label, 0.0, 0.0, 0.0, 0.0)
+            self.lut.Modified()
+
+    def update_lut_entry(self, layer_data):
+        color = layer_data.color
+        alpha = layer_data.alpha if layer_data.visible else 0.0
+        self.lut.SetTableValue(self.labels[layer_data], color[0] / 255, color[1] / 255, color[2] / 255, alpha)
+        self.lut.Modified()
+
+    def update_layer(self, layer_data, layers):
+        """Apply a color/alpha/visibility change of a layer. layers: the layers in stacking order (bottom first)."""
+        self.update_lut_entry(layer_data)
+
+        if self.visible[layer_data] != layer_data.visible:
+            self.visible[layer_data] = layer_data.visible
+
+            # pixels covered by this layer may now show (or hide) the layers below it
+            region = layer_data.bounding_box()
+            if region is not None:
+                self.composite(layers, region, only_if_changed=True)
+
+    def composite(self, layers, region=None, only_if_changed=False):
+        """Re-pack the label map within region (y_slice, x_slice; None for the whole image) from the layers in stacking order (bottom first)."""
+        if region is None:
+            region = (slice(None), slice(None))
+
+        # a pixel takes the top-most visible layer, or the top-most (hidden) layer if none is visible
+        shape = get_numpy_view(self.label_image)[0][region].shape
+        packed = np.zeros(shape, dtype=np.uint8)
+        packed_visible = np.zeros(shape, dtype=np.uint8)
+        for layer_data in layers:
+            if layer_data not in self.labels:
+                continue
+            if not layer_data.visible and not layer_data.is_loaded():
+                continue  # a hidden layer left on disk is packed when it is shown (see update_layer())
+            mask = layer_data.get_mask(region) != 0
+            packed[mask] = self.labels[layer_data]
+            if layer_data.visible:
+                packed_visible[mask] = self.labels[layer_data]
+        packed = np.where(packed_visible != 0, packed_visible, packed)
+
+        label_map = get_numpy_view(self.label_image)[0]
+        if only_if_changed and np.array_equal(label_map[region], packed):
+            return
+
+        label_map[region] = packed
+        self.label_image.Modified()
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# the modules of the application are at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.get_config() (used by the logger) needs the folders normally set in the .env file
+os.environ.setdefault("log_dir", os.path.join(tempfile.gettempdir(), "vtk_image_labeler_tests", "logs"))
+os.environ.setdefault("temp_dir", os.path.join(tempfile.gettempdir(), "vtk_image_labeler_tests", "temp"))
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from layer_statistics import LayerStatistics
+from mask_store import TiledMaskStore
+
+
+class Layer:
+    """The part of SegmentationItem that LayerStatistics.from_layer() uses."""
+    def __init__(self, mask):
+        self.store = TiledMaskStore.from_dense(mask)
+
+    def iter_mask_tiles(self):
+        return self.store.iter_tiles()
+
+
+def full_summary(mask, intensity, spacing, origin):
+    ys, xs = np.nonzero(mask)
+    values = intensity[mask != 0].astype(np.float64)
+    return {
+        "count": ys.size,
+        "area": ys.size * spacing[0] * spacing[1],
+        "centroid": (origin[0] + spacing[0] * xs.mean(), origin[1] + spacing[1] * ys.mean()),
+        "bounding_box": (xs.min(), ys.min(), xs.max(), ys.max()),
+        "mean": values.mean(),
+        "std": values.std(),
+    }
+
+
+def assert_summary_equal(summary, expected):
+    assert summary["count"] == expected["count"]
+    assert summary["bounding_box"] == expected["bounding_box"]
+    for key in ("area", "mean", "std"):
+        assert summary[key] == pytest.approx(expected[key])
+    assert summary["centroid"] == pytest.approx(expected["centroid"])
+
+
+def test_from_layer_matches_a_full_computation():
+    rng = np.random.default_rng(0)
+    intensity = rng.normal(100, 20, (120, 150))
+    mask = np.zeros((120, 150), dtype=np.uint8)
+    mask[10:40, 70:140] = rng.random((30, 70)) < 0.4
+
+    statistics = LayerStatistics.from_layer(Layer(mask), intensity)
+    assert_summary_equal(statistics.get_summary((0.5, 2.0), (10.0, -5.0)), full_summary(mask, intensity, (0.5, 2.0), (10.0, -5.0)))
+
+
+def test_incremental_updates_match_a_full_computation():
+    rng = np.random.default_rng(1)
+    intensity = rng.normal(50, 10, (80, 90))
+    mask = np.zeros((80, 90), dtype=np.uint8)
+    statistics = LayerStatistics(mask.shape)
+
+    for _ in range(30):
+        y0, x0 = rng.integers(0, 70), rng.integers(0, 80)
+        region = (slice(y0, y0 + rng.integers(1, 20)), slice(x0, x0 + rng.integers(1, 20)))
+        before = mask[region].copy()
+        mask[region] = rng.random(before.shape) < 0.6
+        statistics.update(region, before, mask[region], intensity)
+
+        if mask.any():
+            assert_summary_equal(statistics.get_summary(), full_summary(mask, intensity, (1.0, 1.0), (0.0, 0.0)))
+
+
+def test_empty_layer():
+    statistics = LayerStatistics((10, 10))
+    assert statistics.bounding_box() is None
+    summary = statistics.get_summary()
+    assert summary["count"] == 0
+    assert summary["centroid"] is None and summary["mean"] is None
+
+    mask = np.ones((10, 10), dtype=np.uint8)
+    intensity = np.zeros((10, 10))
+    statistics.add((slice(0, 10), slice(0, 10)), mask != 0, intensity, 1)
+    statistics.add((slice(0, 10), slice(0, 10)), mask != 0, intensity, -1)
+    assert statistics.count == 0
+    assert statistics.bounding_box() is None
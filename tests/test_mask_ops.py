@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from mask_ops import ellipse_stencil, get_brush_stencil, stamp, stroke, stroke_region, bounding_box, pad_region
+
+
+def reference_ellipse(array, x, y, rx, ry, value):
+    yy, xx = np.mgrid[0:array.shape[0], 0:array.shape[1]]
+    array[((xx - x) / rx) ** 2 + ((yy - y) / ry) ** 2 <= 1.0] = value
+
+
+def test_ellipse_stencil_shape_and_symmetry():
+    stencil = ellipse_stencil(3, 2)
+    assert stencil.shape == (5, 7)
+    assert stencil[2, 3]
+    assert not stencil[0, 0]
+    assert np.array_equal(stencil, stencil[::-1, ::-1])
+
+
+def test_brush_stencil_is_cached_and_read_only():
+    assert get_brush_stencil(4, 4) is get_brush_stencil(4, 4)
+    with pytest.raises(ValueError):
+        get_brush_stencil(4, 4)[0, 0] = True
+    with pytest.raises(ValueError):
+        get_brush_stencil(4, 4, shape="square")
+
+
+@pytest.mark.parametrize("x, y", [(10, 10), (0, 0), (19, 5), (-2, 3)])
+def test_stamp_matches_reference_and_clips(x, y):
+    array = np.zeros((15, 20), dtype=np.uint8)
+    region = stamp(array, get_brush_stencil(3, 2), x, y, 1)
+
+    expected = np.zeros_like(array)
+    reference_ellipse(expected, x, y, 3, 2, 1)
+    assert np.array_equal(array, expected)
+    assert np.count_nonzero(array) == np.count_nonzero(array[region])
+
+
+def test_stamp_outside_returns_none():
+    array = np.zeros((10, 10), dtype=np.uint8)
+    assert stamp(array, get_brush_stencil(2, 2), 30, 30, 1) is None
+    assert not array.any()
+
+
+def test_stamp_with_intensity_window():
+    array = np.zeros((10, 10), dtype=np.uint8)
+    intensity = np.tile(np.arange(10), (10, 1))
+    stamp(array, get_brush_stencil(4, 4), 5, 5, 1, window=(intensity, 3, 6))
+    assert array.any()
+    assert np.all((intensity[array != 0] >= 3) & (intensity[array != 0] <= 6))
+
+
+def test_stroke_covers_stamps_along_the_segment():
+    array = np.zeros((40, 60), dtype=np.uint8)
+    region = stroke(array, 3, 2, 5, 5, 50, 35, 1)
+
+    # the integer points of the segment (it has 16)
+    stamps = np.zeros_like(array)
+    for i in range(16):
+        stamp(stamps, get_brush_stencil(3, 2), 5 + 3 * i, 5 + 2 * i, 1)
+    assert np.all(array[stamps != 0] == 1)
+    assert region == stroke_region(array.shape, 3, 2, 5, 5, 50, 35)
+    assert np.count_nonzero(array) == np.count_nonzero(array[region])
+
+
+def test_stroke_of_one_point_is_a_stamp():
+    a = np.zeros((20, 20), dtype=np.uint8)
+    b = np.zeros((20, 20), dtype=np.uint8)
+    stroke(a, 4, 3, 8, 9, 8, 9, 1)
+    stamp(b, get_brush_stencil(4, 3), 8, 9, 1)
+    assert np.array_equal(a, b)
+
+
+def test_stroke_erases():
+    array = np.ones((20, 20), dtype=np.uint8)
+    stroke(array, 2, 2, 2, 10, 17, 10, 0)
+    assert array[10, 2:18].sum() == 0
+    assert array[0].all()
+
+
+def test_bounding_box_and_pad_region():
+    array = np.zeros((10, 12), dtype=np.uint8)
+    assert bounding_box(array) is None
+
+    array[3:5, 7:11] = 1
+    box = bounding_box(array)
+    assert box == (slice(3, 5), slice(7, 11))
+    assert pad_region(box, 2, array.shape) == (slice(1, 7), slice(5, 12))
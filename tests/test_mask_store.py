@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from mask_ops import bounding_box
+from mask_store import PackedMaskStore, TiledMaskStore
+
+
+def random_mask(shape, seed, density=0.3):
+    rng = np.random.default_rng(seed)
+    mask = np.zeros(shape, dtype=np.uint8)
+    mask[5:shape[0] // 2, 13:shape[1] - 7] = rng.random((shape[0] // 2 - 5, shape[1] - 20)) < density
+    return mask
+
+
+@pytest.mark.parametrize("store_class", [PackedMaskStore, TiledMaskStore])
+@pytest.mark.parametrize("shape", [(1, 1), (37, 53), (130, 200)])
+def test_roundtrip(store_class, shape):
+    mask = random_mask(shape, 0) if min(shape) > 30 else np.ones(shape, dtype=np.uint8)
+    store = store_class.from_dense(mask)
+    assert np.array_equal(store.to_dense(), mask)
+    assert store.count() == np.count_nonzero(mask)
+    assert store.bounding_box() == bounding_box(mask)
+
+
+@pytest.mark.parametrize("store_class", [PackedMaskStore, TiledMaskStore])
+def test_region_get_and_set_match_a_dense_array(store_class):
+    rng = np.random.default_rng(1)
+    dense = np.zeros((150, 170), dtype=np.uint8)
+    store = store_class(dense.shape)
+    for _ in range(50):
+        y0, x0 = rng.integers(0, 150), rng.integers(0, 170)
+        region = (slice(y0, y0 + rng.integers(1, 60)), slice(x0, x0 + rng.integers(1, 60)))
+        values = (rng.random(dense[region].shape) < 0.5).astype(np.uint8)
+        dense[region] = values
+        store[region] = values
+        assert np.array_equal(store[region], dense[region])
+    assert np.array_equal(store.to_dense(), dense)
+    assert store.count() == np.count_nonzero(dense)
+
+
+def test_tiled_store_allocates_only_occupied_tiles():
+    store = TiledMaskStore((256, 256), tile_size=64)
+    assert store.nbytes() == 0
+    assert store.bounding_box() is None
+
+    store[(slice(70, 75), slice(130, 140))] = 1
+    assert list(store.tiles) == [(1, 2)]
+    assert [region for region, _ in store.iter_tiles()] == [(slice(64, 128), slice(128, 192))]
+
+    store[(slice(70, 75), slice(130, 140))] = 0
+    assert store.tiles == {}
+
+
+def test_tiled_store_copy_is_independent():
+    store = TiledMaskStore.from_dense(random_mask((100, 100), 2))
+    copy = store.copy()
+    store[(slice(0, 100), slice(0, 100))] = 0
+    assert copy.count() > 0
+    assert store.count() == 0
+
+
+def test_packed_store_keeps_pixels_sharing_a_byte():
+    store = PackedMaskStore((1, 16))
+    store[(slice(0, 1), slice(0, 16))] = 1
+    store[(slice(0, 1), slice(3, 5))] = 0
+    assert store[None].tolist() == [[1, 1, 1, 0, 0] + [1] * 11]
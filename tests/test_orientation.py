@@ -0,0 +1,63 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from orientation import Orientation, OPERATIONS, FLIP_X, ROT_PLUS_90, transform_array, transform_geometry
+
+SEQUENCES = list(itertools.product(OPERATIONS, repeat=3))  # 64 sequences of 3 operations
+
+
+@pytest.mark.parametrize("operations", SEQUENCES)
+def test_materialize_matches_the_operations_applied_in_order(operations):
+    array = np.arange(3 * 5).reshape(1, 3, 5)
+    dims, spacing = (5, 3, 1), (0.5, 2.0, 1.0)
+
+    orientation = Orientation()
+    expected, expected_dims, expected_spacing = array, dims, spacing
+    for operation in operations:
+        orientation = orientation.apply(operation)
+        expected = transform_array(expected, operation)
+        expected_dims, expected_spacing = transform_geometry(expected_dims, expected_spacing, operation)
+
+    assert np.array_equal(orientation.materialize_array(array), expected)
+    assert orientation.materialize_geometry(dims, spacing) == (expected_dims, expected_spacing)
+
+    # to_operations() (an optional flip, then rotations) gives the same orientation
+    shortest = Orientation()
+    for operation in orientation.to_operations():
+        shortest = shortest.apply(operation)
+    assert shortest == orientation
+    assert len(orientation.to_operations()) <= 4
+
+
+def test_there_are_8_orientations():
+    matrices = set()
+    for length in range(4):
+        for operations in itertools.product(OPERATIONS, repeat=length):
+            orientation = Orientation()
+            for operation in operations:
+                orientation = orientation.apply(operation)
+            matrices.add(tuple(orientation.matrix.ravel()))
+    assert len(matrices) == 8
+
+
+def test_inverse_operations():
+    assert Orientation().apply(FLIP_X).apply(FLIP_X).is_identity()
+    orientation = Orientation()
+    for _ in range(4):
+        orientation = orientation.apply(ROT_PLUS_90)
+    assert orientation.is_identity()
+
+
+def test_list_roundtrip():
+    orientation = Orientation().apply(ROT_PLUS_90).apply(FLIP_X)
+    assert Orientation.from_list(orientation.to_list()) == orientation
+    assert Orientation.from_list(None).is_identity()
+
+
+def test_model_transform_keeps_the_center():
+    orientation = Orientation().apply(ROT_PLUS_90)
+    m = orientation.get_model_transform((10.0, 20.0, 0.0))
+    assert m.MultiplyPoint((10.0, 20.0, 0.0, 1.0))[:2] == pytest.approx((10.0, 20.0))
+    assert orientation.transform_vector([1.0, 0.0, 3.0]) == pytest.approx([0.0, 1.0, 3.0])
@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+import vtk
+
+from itkvtk import load_vtk_image_using_sitk
+from vtk_segmentation_list_manager import SegmentationItem, SegmentationListManager
+from vtk_tools import get_numpy_view
+from workspace_io import run_save_jobs
+
+
+class Manager:
+    """The save logic of SegmentationListManager, without the viewer and the widgets."""
+    prepare_save = SegmentationListManager.prepare_save
+    prepare_copy_layer_files = SegmentationListManager.prepare_copy_layer_files
+    save_finished = SegmentationListManager.save_finished
+    save_segmentation_layer = SegmentationListManager.save_segmentation_layer
+    save_layer_contours = SegmentationListManager.save_layer_contours
+    get_layer_contours = SegmentationListManager.get_layer_contours
+
+    def __init__(self):
+        self.segmentation_layers = {}
+        self.saved_data_dir = None
+        self.copied_layer_files = []
+        self.saved_layer_files = []
+
+    def add_layer(self, layer_name, value):
+        image = vtk.vtkImageData()
+        image.SetDimensions(16, 12, 1)
+        image.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 1)
+        get_numpy_view(image)[0][:] = 0
+        get_numpy_view(image)[0][value:value + 2, value:value + 3] = 1
+        layer_data = SegmentationItem(segmentation=image)
+        layer_data.modified = True
+        self.segmentation_layers[layer_name] = layer_data
+
+    def rename(self, layer_name, new_name):
+        # as SegmentationListItemWidget.update_layer_name()
+        self.segmentation_layers[new_name] = self.segmentation_layers.pop(layer_name)
+
+    def save(self, data_dir):
+        data_dict = {}
+        jobs = self.prepare_save(data_dict, str(data_dir))
+        for layer_data in self.segmentation_layers.values():
+            layer_data.modified = False
+        run_save_jobs(jobs)
+        self.save_finished(str(data_dir), True)
+        return [os.path.basename(path) for path, _ in jobs], data_dict
+
+
+def saved_mask(data_dir, layer_name):
+    return get_numpy_view(load_vtk_image_using_sitk(os.path.join(data_dir, f"{layer_name}.mha")))[0]
+
+
+def expected_mask(value):
+    mask = np.zeros((12, 16), np.uint8)
+    mask[value:value + 2, value:value + 3] = 1
+    return mask
+
+
+def test_unmodified_layers_are_not_saved_again(tmp_path):
+    manager = Manager()
+    manager.add_layer("Layer 1", 1)
+    manager.add_layer("Layer 2", 5)
+
+    written, _ = manager.save(tmp_path)
+    assert sorted(written) == ["Layer 1.contours.json", "Layer 1.mha", "Layer 2.contours.json", "Layer 2.mha"]
+
+    written, data_dict = manager.save(tmp_path)
+    assert written == []
+    assert data_dict["segmentations"]["Layer 2"]["file"] == "Layer 2.mha"
+
+
+def test_layer_renamed_onto_a_stale_file_is_saved(tmp_path):
+    manager = Manager()
+    manager.add_layer("Layer 1", 1)
+    manager.add_layer("Layer 2", 5)
+    manager.save(tmp_path)
+
+    del manager.segmentation_layers["Layer 1"]
+    manager.rename("Layer 2", "Layer 1")
+
+    written, data_dict = manager.save(tmp_path)
+    assert sorted(written) == ["Layer 1.contours.json", "Layer 1.mha"]
+    assert data_dict["segmentations"]["Layer 1"]["file"] == "Layer 1.mha"
+    np.testing.assert_array_equal(saved_mask(tmp_path, "Layer 1"), expected_mask(5))
+
+    # the layer is in sync with its new file
+    assert manager.save(tmp_path)[0] == []
+
+
+def test_swapped_layer_names_are_saved(tmp_path):
+    manager = Manager()
+    manager.add_layer("A", 1)
+    manager.add_layer("B", 5)
+    manager.save(tmp_path)
+
+    manager.rename("A", "tmp")
+    manager.rename("B", "A")
+    manager.rename("tmp", "B")
+
+    written, _ = manager.save(tmp_path)
+    assert sorted(written) == ["A.contours.json", "A.mha", "B.contours.json", "B.mha"]
+    np.testing.assert_array_equal(saved_mask(tmp_path, "A"), expected_mask(5))
+    np.testing.assert_array_equal(saved_mask(tmp_path, "B"), expected_mask(1))
+
+
+def test_removed_and_added_again_layer_is_saved(tmp_path):
+    manager = Manager()
+    manager.add_layer("Layer 1", 1)
+    manager.save(tmp_path)
+
+    del manager.segmentation_layers["Layer 1"]
+    manager.add_layer("Layer 1", 7)
+
+    written, _ = manager.save(tmp_path)
+    assert sorted(written) == ["Layer 1.contours.json", "Layer 1.mha"]
+    np.testing.assert_array_equal(saved_mask(tmp_path, "Layer 1"), expected_mask(7))
+
+
+def test_swapped_layers_left_on_disk_are_read_before_their_files_are_replaced(tmp_path):
+    manager = Manager()
+    manager.add_layer("A", 1)
+    manager.add_layer("B", 5)
+    manager.save(tmp_path)
+
+    # as load_state() leaves the hidden layers on disk
+    for layer_name in ("A", "B"):
+        path = os.path.join(tmp_path, f"{layer_name}.mha")
+        layer_data = SegmentationItem(segmentation=None, file_path=path)
+        layer_data.saved_file_path = path
+        layer_data.contours_file_path = os.path.join(tmp_path, f"{layer_name}.contours.json")
+        manager.segmentation_layers[layer_name] = layer_data
+
+    manager.rename("A", "tmp")
+    manager.rename("B", "A")
+    manager.rename("tmp", "B")
+
+    manager.save(tmp_path)
+    np.testing.assert_array_equal(saved_mask(tmp_path, "A"), expected_mask(5))
+    np.testing.assert_array_equal(saved_mask(tmp_path, "B"), expected_mask(1))
@@ -0,0 +1,95 @@
+import numpy as np
+
+from mask_ops import stroke
+from undo_history import compress_mask, decompress_mask, MaskEdit, StrokeRecorder, UndoHistory
+
+
+def test_compress_roundtrip():
+    mask = (np.random.default_rng(0).random((33, 47)) < 0.3).astype(np.uint8)
+    assert np.array_equal(decompress_mask(compress_mask(mask), mask.shape), mask)
+
+
+def test_mask_edit_is_cropped_to_the_changed_pixels():
+    before = np.zeros((20, 30), dtype=np.uint8)
+    after = before.copy()
+    after[4:6, 10:13] = 1
+
+    edit = MaskEdit.from_arrays("layer", (slice(10, 30), slice(5, 35)), before, after)
+    assert edit.region == (slice(14, 16), slice(15, 18))
+    assert edit.get_before().sum() == 0
+    assert edit.get_after().all()
+    assert MaskEdit.from_arrays("layer", (slice(0, 20), slice(0, 30)), before, before) is None
+
+
+def test_stroke_recorder_records_the_stroke():
+    mask = np.zeros((200, 200), dtype=np.uint8)
+    mask[150:, 150:] = 1
+    original = mask.copy()
+
+    recorder = StrokeRecorder("layer", mask)
+    for x0, y0, x1, y1 in [(10, 10, 100, 30), (100, 30, 120, 140)]:
+        recorder.capture((slice(min(y0, y1) - 5, max(y0, y1) + 6), slice(min(x0, x1) - 5, max(x0, x1) + 6)))
+        stroke(mask, 5, 5, x0, y0, x1, y1, 1)
+    edit = recorder.finish()
+
+    restored = mask.copy()
+    restored[edit.region] = edit.get_before()
+    assert np.array_equal(restored, original)
+    assert np.array_equal(edit.get_after(), mask[edit.region])
+
+
+def test_stroke_recorder_without_change():
+    mask = np.zeros((50, 50), dtype=np.uint8)
+    recorder = StrokeRecorder("layer", mask)
+    assert recorder.finish() is None
+    recorder.capture((slice(0, 10), slice(0, 10)))
+    assert recorder.finish() is None
+
+
+def make_step(n):
+    before = np.zeros((64, 64), dtype=np.uint8)
+    after = (np.random.default_rng(n).random((64, 64)) < 0.5).astype(np.uint8)
+    return [MaskEdit("layer", (slice(0, 64), slice(0, 64)), before, after)]
+
+
+def test_undo_redo_order():
+    history = UndoHistory()
+    steps = [make_step(i) for i in range(3)]
+    for step in steps:
+        history.push(step)
+
+    assert history.pop_undo() == steps[2]
+    assert history.pop_undo() == steps[1]
+    assert history.pop_redo() == steps[1]
+    assert history.can_undo() and history.can_redo()
+
+    # a new step clears the redo stack
+    history.push(make_step(3))
+    assert not history.can_redo()
+    assert history.pop_redo() is None
+
+
+def test_budget_evicts_the_oldest_steps_but_keeps_the_last():
+    step_nbytes = UndoHistory.get_step_nbytes(make_step(0))
+    history = UndoHistory(max_bytes=int(step_nbytes * 2.5))
+    steps = [make_step(i) for i in range(5)]
+    for step in steps:
+        history.push(step)
+    assert history.undo_stack == steps[-2:]
+    assert history.nbytes() <= history.max_bytes
+
+    tiny = UndoHistory(max_bytes=1)
+    tiny.push(steps[0])
+    tiny.push(steps[1])
+    assert tiny.undo_stack == [steps[1]]
+
+
+def test_discard_layer():
+    history = UndoHistory()
+    layer_a, layer_b = object(), object()
+    a = MaskEdit(layer_a, (slice(0, 1), slice(0, 1)), np.zeros((1, 1)), np.ones((1, 1)))
+    b = MaskEdit(layer_b, (slice(0, 1), slice(0, 1)), np.zeros((1, 1)), np.ones((1, 1)))
+    history.push([a, b])
+    history.push([a])
+    history.discard_layer(layer_a)
+    assert history.undo_stack == [[b]]
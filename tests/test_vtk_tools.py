@@ -0,0 +1,41 @@
+import numpy as np
+
+from vtk_tools import extract_contours, point_in_polygon, polygon_signed_area
+
+
+def test_signed_area_and_point_in_polygon():
+    square = np.array([[0, 0], [2, 0], [2, 2], [0, 2]], dtype=float)
+    assert polygon_signed_area(square) == 4.0
+    assert polygon_signed_area(square[::-1]) == -4.0
+    assert point_in_polygon(1.0, 1.0, square)
+    assert not point_in_polygon(3.0, 1.0, square)
+
+
+def test_holes_are_flagged_and_wound_clockwise():
+    # a frame with a hole, an island in the hole, and a separate blob
+    mask = np.zeros((30, 40), np.uint8)
+    mask[2:20, 2:20] = 1
+    mask[6:16, 6:16] = 0
+    mask[9:13, 9:13] = 1
+    mask[24:28, 30:36] = 1
+    region = (slice(10, 40), slice(5, 45))
+    spacing, origin = (0.5, 2.0), (100.0, -50.0)
+
+    polygons = extract_contours(mask, region, spacing, origin)
+
+    assert sorted(polygon["hole"] for polygon in polygons) == [False, False, False, True]
+    for polygon in polygons:
+        area = polygon_signed_area(np.array(polygon["points"]))
+        assert (area < 0) == polygon["hole"]
+
+    # the pixel centers of the mask are inside the outer boundaries and outside the holes (even-odd rule)
+    ys, xs = np.indices(mask.shape)
+    world_x = origin[0] + (xs + region[1].start) * spacing[0]
+    world_y = origin[1] + (ys + region[0].start) * spacing[1]
+    for x, y, value in zip(world_x.ravel(), world_y.ravel(), mask.ravel()):
+        inside = sum(point_in_polygon(x, y, np.array(polygon["points"])) for polygon in polygons) % 2 == 1
+        assert inside == bool(value)
+
+
+def test_empty_mask_has_no_contours():
+    assert extract_contours(np.zeros((4, 4), np.uint8), (slice(0, 4), slice(0, 4)), (1.0, 1.0), (0.0, 0.0)) == []
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from workspace_io import atomic_write, run_save_jobs, run_load_jobs, is_same_path
+
+
+def write_text(text):
+    def write(path):
+        with open(path, "w") as f:
+            f.write(text)
+    return write
+
+
+def test_atomic_write_moves_the_written_files(tmp_path):
+    target = tmp_path / "image.mhd"
+
+    def write(path):
+        write_text("header")(path)
+        write_text("data")(os.path.join(os.path.dirname(path), "image.zraw"))
+
+    atomic_write(str(target), write)
+    assert target.read_text() == "header"
+    assert (tmp_path / "image.zraw").read_text() == "data"
+    assert sorted(os.listdir(tmp_path)) == ["image.mhd", "image.zraw"]
+
+
+def test_atomic_write_failure_keeps_the_old_file_and_cleans_up(tmp_path):
+    target = tmp_path / "layer.mha"
+    target.write_text("old")
+
+    def fail(path):
+        write_text("partial")(path)
+        raise IOError("disk full")
+
+    with pytest.raises(IOError):
+        atomic_write(str(target), fail)
+    assert target.read_text() == "old"
+    assert os.listdir(tmp_path) == ["layer.mha"]
+
+
+def test_run_save_jobs_reports_progress_and_raises_after_the_other_jobs(tmp_path):
+    def fail(path):
+        raise ValueError("cannot encode")
+
+    jobs = [(str(tmp_path / f"{i}.txt"), write_text(str(i))) for i in range(5)]
+    jobs.insert(2, (str(tmp_path / "bad.txt"), fail))
+
+    progress = []
+    with pytest.raises(ValueError):
+        run_save_jobs(jobs, lambda done, total, file_path: progress.append((done, total)), max_workers=3)
+
+    assert sorted(os.listdir(tmp_path)) == [f"{i}.txt" for i in range(5)]
+    assert progress == [(i, 6) for i in range(1, 7)]
+    run_save_jobs([])
+
+
+def test_run_load_jobs_returns_results_and_exceptions(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+
+    def read(path):
+        with open(path) as f:
+            return f.read()
+
+    results = run_load_jobs([(str(tmp_path / "a.txt"), read), (str(tmp_path / "missing.txt"), read)])
+    assert results[str(tmp_path / "a.txt")] == "a"
+    assert isinstance(results[str(tmp_path / "missing.txt")], FileNotFoundError)
+    assert run_load_jobs([]) == {}
+
+
+def test_is_same_path(tmp_path):
+    folder = tmp_path / "data"
+    folder.mkdir()
+
+    assert is_same_path(str(folder), str(folder) + os.sep)
+    assert is_same_path(str(folder), os.path.join(str(tmp_path), ".", "data"))
+    assert not is_same_path(str(folder), str(tmp_path))
+    assert not is_same_path(str(folder), None)
+
+    link = tmp_path / "link"
+    try:
+        os.symlink(folder, link)
+    except (OSError, NotImplementedError):
+        pytest.skip("symbolic links are not supported")
+    assert is_same_path(str(folder), str(link))
@@ -0,0 +1,163 @@
+import zlib
+import numpy as np
+
+from mask_ops import bounding_box
+
+
+def compress_mask(mask):
+    """Bit-pack (nonzero -> 1) and zlib-compress a 2D mask."""
+    return zlib.compress(np.packbits(mask != 0).tobytes())
+
+
+def decompress_mask(data, shape):
+    """Inverse of compress_mask(): a uint8 (0/1) array of shape."""
+    bits = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+    return np.unpackbits(bits, count=shape[0] * shape[1]).reshape(shape)
+
+
+class MaskEdit:
+    """
+    One undoable change of a segmentation layer: the pixels of region (y_slice, x_slice) before and after the change,
+    stored compressed. Only the bounding box of the changed pixels is kept, so the cost is proportional to the edit.
+    """
+    def __init__(self, layer_data, region, before, after):
+        self.layer_data = layer_data
+        self.region = region
+        self.shape = before.shape
+        self.before = compress_mask(before)
+        self.after = compress_mask(after)
+
+    def get_before(self):
+        return decompress_mask(self.before, self.shape)
+
+    def get_after(self):
+        return decompress_mask(self.after, self.shape)
+
+    def nbytes(self):
+        return len(self.before) + len(self.after)
+
+    @staticmethod
+    def from_arrays(layer_data, region, before, after):
+        """The edit between two arrays of region, cropped to the changed pixels. None if nothing changed."""
+        changed = bounding_box(before != after)
+        if changed is None:
+            return None
+
+        y0, x0 = int(region[0].start), int(region[1].start)
+        cropped = (slice(y0 + int(changed[0].start), y0 + int(changed[0].stop)),
+                   slice(x0 + int(changed[1].start), x0 + int(changed[1].stop)))
+        return MaskEdit(layer_data, cropped, before[changed], after[changed])
+
+
+class StrokeRecorder:
+    """
+    Records a paint/erase stroke on a dense mask as a MaskEdit.
+
+    Call capture(region) before writing to region: the original pixels of the tiles it overlaps are saved the first
+    time they are touched. finish() compares them with the painted pixels.
+    """
+    def __init__(self, layer_data, mask, tile_size=64):
+        self.layer_data = layer_data
+        self.mask = mask
+        self.tile_size = tile_size
+        self.tiles = {}  # (tile_y, tile_x) -> original pixels of the tile
+
+    def get_tile_bounds(self, ty, tx):
+        ts = self.tile_size
+        return ty * ts, min((ty + 1) * ts, self.mask.shape[0]), tx * ts, min((tx + 1) * ts, self.mask.shape[1])
+
+    def capture(self, region):
+        if region is None:
+            return
+
+        ts = self.tile_size
+        y0, y1, _ = region[0].indices(self.mask.shape[0])
+        x0, x1, _ = region[1].indices(self.mask.shape[1])
+        for ty in range(y0 // ts, (y1 - 1) // ts + 1):
+            for tx in range(x0 // ts, (x1 - 1) // ts + 1):
+                if (ty, tx) not in self.tiles:
+                    by0, by1, bx0, bx1 = self.get_tile_bounds(ty, tx)
+                    self.tiles[(ty, tx)] = self.mask[by0:by1, bx0:bx1].copy()
+
+    def finish(self):
+        """The MaskEdit of the stroke, or None if no pixel changed."""
+        if not self.tiles:
+            return None
+
+        keys = np.array(list(self.tiles.keys()))
+        y0, _, x0, _ = self.get_tile_bounds(keys[:, 0].min(), keys[:, 1].min())
+        _, y1, _, x1 = self.get_tile_bounds(keys[:, 0].max(), keys[:, 1].max())
+        region = (slice(y0, y1), slice(x0, x1))
+
+        # tiles that were not captured in the bounding box of the stroke are unchanged
+        after = self.mask[region]
+        before = after.copy()
+        for (ty, tx), tile in self.tiles.items():
+            by0, by1, bx0, bx1 = self.get_tile_bounds(ty, tx)
+            before[by0 - y0:by1 - y0, bx0 - x0:bx1 - x0] = tile
+
+        return MaskEdit.from_arrays(self.layer_data, region, before, after)
+
+
+class UndoHistory:
+    """
+    Undo/redo stacks of steps, a step being the list of MaskEdits of one user action (a stroke, a fill, a morphology
+    operation on several layers...). When the compressed edits exceed max_bytes, the oldest undo steps are evicted
+    (the most recent step is always kept).
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def push(self, edits):
+        self.undo_stack.append(list(edits))
+        self.redo_stack.clear()
+        self.evict()
+
+    def evict(self):
+        total = self.nbytes()
+        while total > self.max_bytes and len(self.undo_stack) > 1:
+            total -= self.get_step_nbytes(self.undo_stack.pop(0))
+
+    def pop_undo(self):
+        """The step to undo (moved to the redo stack), or None."""
+        if not self.undo_stack:
+            return None
+        step = self.undo_stack.pop()
+        self.redo_stack.append(step)
+        return step
+
+    def pop_redo(self):
+        """The step to redo (moved to the undo stack), or None."""
+        if not self.redo_stack:
+            return None
+        step = self.redo_stack.pop()
+        self.undo_stack.append(step)
+        return step
+
+    def can_undo(self):
+        return len(self.undo_stack) > 0
+
+    def can_redo(self):
+        return len(self.redo_stack) > 0
+
+    def discard_layer(self, layer_data):
+        """Drop the edits of a removed layer (and the steps left empty)."""
+        def discard(stack):
+            steps = [[edit for edit in step if edit.layer_data is not layer_data] for step in stack]
+            return [step for step in steps if step]
+
+        self.undo_stack = discard(self.undo_stack)
+        self.redo_stack = discard(self.redo_stack)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    @staticmethod
+    def get_step_nbytes(step):
+        return sum(edit.nbytes() for edit in step)
+
+    def nbytes(self):
+        return sum(self.get_step_nbytes(step) for step in self.undo_stack + self.redo_stack)
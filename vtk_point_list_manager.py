@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import (QListWidgetItem, QVBoxLayout, QPushButton, QLabel,
 from PyQt5.QtCore import pyqtSignal, QObject
 from PyQt5.QtGui import QColor
 
-from logger import logger
+from logger import logger, trace
 from color_rotator import ColorRotator
 
 class PointItem:
@@ -65,7 +65,7 @@ class PointItem:
     def on_position_changed(self, obj, event):
         self.coordinates = list(self.representation.GetWorldPosition())
         self.modified = True
-        print(f"Point moved to: {self.coordinates}")
+        trace("Point moved to: %s", self.coordinates)
 
 
 class PointListItemWidget(QWidget):
@@ -2,23 +2,70 @@
 
 import vtk
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import (QListWidgetItem, QToolBar, QAction, QToolButton, QVBoxLayout, QPushButton, QLabel, QWidget, QDockWidget, QListWidget, QHBoxLayout, QPushButton, QCheckBox, QLineEdit)
+from PyQt5.QtWidgets import (QListWidgetItem, QToolBar, QAction, QToolButton, QVBoxLayout, QPushButton, QLabel, QWidget, QDockWidget, QListWidget, QHBoxLayout, QPushButton, QCheckBox, QLineEdit, QComboBox, QSpinBox)
 from PyQt5.QtCore import pyqtSignal, QObject
 from PyQt5.QtGui import QColor
 
-from logger import logger
+from logger import logger, trace
 from color_rotator import ColorRotator
 
 import numpy as np
 import math
 
-from vtk_tools import from_vtk_color, to_vtk_color
+from vtk_tools import from_vtk_color, get_numpy_view, extract_contours
+from mask_ops import get_brush_stencil, stamp, stroke, stroke_region, bounding_box, pad_region
+from mask_store import TiledMaskStore
+from undo_history import UndoHistory, StrokeRecorder, MaskEdit
+from layer_statistics import LayerStatistics
+from workspace_io import is_same_path
+from functools import lru_cache
+
+
+def create_placeholder_image():
+    """A transparent 1x1 RGBA image, displayed by the actor of a layer whose colors are not allocated."""
+    image = vtk.vtkImageData()
+    image.SetDimensions(1, 1, 1)
+    image.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 4)
+    image.GetPointData().GetScalars().Fill(0)
+    return image
+
+
+@lru_cache(maxsize=64)
+def get_brush_outline(radius_x, radius_y, pixel_spacing, shape="ellipse"):
+    """Return the (cached) outline polydata of a brush, given its radius in pixels and the pixel spacing."""
+    if shape != "ellipse":
+        raise ValueError(f"Unsupported brush shape: {shape}")
+
+    radius_in_real = (radius_x * pixel_spacing[0], radius_y * pixel_spacing[1])
+
+    points = vtk.vtkPoints()
+    lines = vtk.vtkCellArray()
+
+    num_segments = 50  # Number of segments for the circle
+    for i in range(num_segments):
+        angle = 2.0 * math.pi * i / num_segments
+        x = radius_in_real[0] * math.cos(angle)
+        y = radius_in_real[1] * math.sin(angle)
+        points.InsertNextPoint(x, y, 0)
+
+        # Connect the points to form a circle (the last segment closes it)
+        line = vtk.vtkLine()
+        line.GetPointIds().SetId(0, i)
+        line.GetPointIds().SetId(1, (i + 1) % num_segments)
+        lines.InsertNextCell(line)
+
+    outline = vtk.vtkPolyData()
+    outline.SetPoints(points)
+    outline.SetLines(lines)
+
+    return outline
 
 
 class PaintBrush:
     def __init__(self, radius_in_pixel=(20,20), pixel_spacing=(1.0, 1.0), color= (0,255,0), line_thickness= 1):
         self.radius_in_pixel = radius_in_pixel
         self.pixel_spacing = pixel_spacing
+        self.shape = "ellipse"
 
         # Paintbrush setup
         self.enabled = False
@@ -28,16 +75,9 @@ class PaintBrush:
         self.brush_actor.SetVisibility(False)  # Initially hidden
 
         # Create a green brush representation
-        # Create a 2D circle for brush visualization
-        self.brush_source = vtk.vtkPolyData()
-        self.circle_points = vtk.vtkPoints()
-        self.circle_lines = vtk.vtkCellArray()
-
-
-        self.brush_source.SetPoints(self.circle_points)
-        self.brush_source.SetLines(self.circle_lines)
+        # The 2D circle for brush visualization is set in set_radius_in_pixel()
+        self.brush_source = None
         self.brush_mapper = vtk.vtkPolyDataMapper()
-        self.brush_mapper.SetInputData(self.brush_source)
         self.brush_actor.SetMapper(self.brush_mapper)
         self.brush_actor.GetProperty().SetColor(color[0], color[1], color[2])  
 
@@ -54,70 +94,279 @@ class PaintBrush:
         self.radius_in_pixel = radius_in_pixel
         self.pixel_spacing = pixel_spacing
 
-        radius_in_real = (radius_in_pixel[0] * pixel_spacing[0], radius_in_pixel[1] * pixel_spacing[1])
+        # brush mask and outline are cached, so repeated sizes (slider scrubbing) reuse them
+        self.stencil = get_brush_stencil(radius_in_pixel[0], radius_in_pixel[1], self.shape)
 
-        self.update_circle_geometry(radius_in_real)
+        self.update_circle_geometry()
 
-    def update_circle_geometry(self, radius_in_real):
+    def update_circle_geometry(self):
         """Update the circle geometry to reflect the current radius."""
-        self.circle_points.Reset()
-        self.circle_lines.Reset()
-
-        num_segments = 50  # Number of segments for the circle
-        for i in range(num_segments):
-            angle = 2.0 * math.pi * i / num_segments
-            x = radius_in_real[0] * math.cos(angle)
-            y = radius_in_real[1] * math.sin(angle)
-            self.circle_points.InsertNextPoint(x, y, 0)
-
-            # Connect the points to form a circle
-            if i > 0:
-                line = vtk.vtkLine()
-                line.GetPointIds().SetId(0, i - 1)
-                line.GetPointIds().SetId(1, i)
-                self.circle_lines.InsertNextCell(line)
-
-        # Close the circle
-        line = vtk.vtkLine()
-        line.GetPointIds().SetId(0, num_segments - 1)
-        line.GetPointIds().SetId(1, 0)
-        self.circle_lines.InsertNextCell(line)
+        self.brush_source = get_brush_outline(
+            self.radius_in_pixel[0], 
+            self.radius_in_pixel[1], 
+            tuple(self.pixel_spacing[:2]), 
+            self.shape)
+        
+        self.brush_mapper.SetInputData(self.brush_source)
 
-        # Notify VTK that the geometry has been updated
-        self.circle_points.Modified()
-        self.circle_lines.Modified()
-        self.brush_source.Modified()
+    def paint(self, segmentation, x, y, value=1, window=None):
+        """
+        Draw a circle on the segmentation at (x, y) with the given radius. Returns the painted region as (y_slice, x_slice), or None.
+        Threshold brush: with window (intensity array of the segmentation shape, lower, upper), only the pixels
+        with an intensity in [lower, upper] are painted.
+        """
+        extent = segmentation.GetExtent()
 
+        # zero-copy view of the segmentation scalars (row=y, col=x)
+        view = get_numpy_view(segmentation)[0]
 
-    def paint(self, segmentation, x, y, value=1):
-        """Draw a circle on the segmentation at (x, y) with the given radius."""
-        dims = segmentation.GetDimensions()
-        scalars = segmentation.GetPointData().GetScalars()
+        return stamp(view, self.stencil, x - extent[0], y - extent[2], value, window)
+
+    def paint_stroke(self, segmentation, x0, y0, x1, y1, value=1, window=None):
+        """Paint the gap-free stroke of the brush moving from (x0, y0) to (x1, y1), gated by window as in paint(). Returns the painted region as (y_slice, x_slice), or None."""
         extent = segmentation.GetExtent()
 
-        # radius in pixel space
-        radius_in_pixelx = self.radius_in_pixel[0]
-        radius_in_pixely = self.radius_in_pixel[1]
-
-        for i in range(-radius_in_pixelx, radius_in_pixelx + 1):
-            for j in range(-radius_in_pixely, radius_in_pixely + 1):
-                
-                # Check if the pixel is within the circle
-                if ((i/radius_in_pixelx)**2 + (j/radius_in_pixely)**2) <= 1.0:
-                    xi = x + i
-                    yj = y + j
-                    if extent[0] <= xi <= extent[1] and extent[2] <= yj <= extent[3]:
-                        idx = (yj - extent[2]) * dims[0] + (xi - extent[0])
-                        scalars.SetTuple1(idx, value)
+        view = get_numpy_view(segmentation)[0]
+
+        return stroke(
+            view, 
+            self.radius_in_pixel[0], 
+            self.radius_in_pixel[1], 
+            x0 - extent[0], y0 - extent[2], 
+            x1 - extent[0], y1 - extent[2], 
+            value,
+            window)
+
+    def get_stroke_region(self, segmentation, x0, y0, x1, y1):
+        """The region (y_slice, x_slice) that paint_stroke() with the same arguments can touch, or None."""
+        extent = segmentation.GetExtent()
+        dims = segmentation.GetDimensions()
+
+        return stroke_region(
+            (dims[1], dims[0]),
+            self.radius_in_pixel[0],
+            self.radius_in_pixel[1],
+            x0 - extent[0], y0 - extent[2],
+            x1 - extent[0], y1 - extent[2])
 
 class SegmentationItem:
-    def __init__(self, segmentation, visible=True, color=np.array([255, 255, 128]), alpha=0.5, actor=None) -> None:
-        self.segmentation = segmentation
+    """
+    A segmentation layer. The mask is either a dense uint8 vtkImageData (while it is edited) or, after compact(),
+    a sparse TiledMaskStore (bit-packed 64x64 tiles, empty tiles are not allocated). Accessing .segmentation
+    materializes the dense image again; get_mask(), bounding_box(), count() and iter_mask_tiles() read either
+    representation without materializing it.
+
+    A layer opened from a workspace can also be left on disk (segmentation None, file_path set): its file is read
+    into the compact representation the first time the pixels are accessed. If the file cannot be read then, the
+    layer becomes unavailable: an empty mask with the geometry given at creation (load_error is set).
+    """
+    def __init__(self, segmentation, visible=True, color=np.array([255, 255, 128]), alpha=0.5, actor=None, file_path=None) -> None:
+        self._segmentation = segmentation
+        self.store = None
+        self.file_path = file_path          # layer file, read on first access if the layer is not loaded
+        self.contours_file_path = None      # outlines saved along with the layer file
+        self.saved_file_path = None         # file the layer was last saved to or loaded from (in sync unless modified)
+        self.load_error = None              # why the layer file could not be read (the layer is unavailable)
+        self.on_load_error = None           # called with (layer, exception) when the layer file cannot be read
+        self.colors_outdated = True         # the actor displays a placeholder until the layer is colored
         self.visible = visible
         self.color = color
         self.alpha = alpha
         self.actor = actor
         self.modified = False
+        self.statistics = None  # LayerStatistics, computed on first use and then updated incrementally
+        self.contours = None    # outline polygons (world coordinates), computed on first use until the mask changes
+
+    @property
+    def segmentation(self):
+        """The dense vtkImageData of the mask (materialized from the packed store if the layer is compact)."""
+        self.load()
+        if self._segmentation is None:
+            self._segmentation = self.create_segmentation_image()
+            self.store = None
+        return self._segmentation
+
+    def is_compact(self):
+        return self._segmentation is None
+
+    def is_loaded(self):
+        return self._segmentation is not None or self.store is not None
+
+    def load(self, segmentation=None):
+        """
+        Read the layer file into the compact representation, if the layer is not loaded yet.
+        segmentation: the image already read from the file (e.g. by a parallel loader).
+        """
+        if self.is_loaded():
+            return
+
+        if segmentation is None:
+            from itkvtk import load_vtk_image_using_sitk
+            logger.info(f"Loading segmentation layer from {self.file_path}")
+            try:
+                segmentation = load_vtk_image_using_sitk(self.file_path)
+            except Exception as e:
+                # the file was moved, deleted or corrupted since the workspace was opened
+                logger.error(f"Failed to read segmentation layer {self.file_path}: {e}", exc_info=True)
+                dims = self.geometry[0]
+                self.store = TiledMaskStore((dims[1], dims[0]))
+                self.load_error = str(e)
+                if self.on_load_error is not None:
+                    self.on_load_error(self, e)
+                return
+        self._segmentation = segmentation
+        self.compact()
+
+    def compact(self):
+        """Pack the mask into sparse tiles and release the dense image (nonzero values are stored as 1)."""
+        if self._segmentation is None:
+            return
+
+        self.geometry = self.get_geometry()
+        self.store = TiledMaskStore.from_dense(get_numpy_view(self._segmentation)[0])
+        self._segmentation = None
+
+    def get_geometry(self):
+        """(dimensions, spacing, origin, direction matrix) of the mask image."""
+        self.load()
+        if self._segmentation is None:
+            return self.geometry
+        segmentation = self._segmentation
+        return (segmentation.GetDimensions(), segmentation.GetSpacing(), segmentation.GetOrigin(), segmentation.GetDirectionMatrix())
+
+    def snapshot(self):
+        """
+        A detached, compact copy of the layer (e.g. to save it from another thread while this layer is edited).
+        A compact layer copies its allocated tiles (proportional to the labeled area); a dense layer (the active one)
+        is packed into tiles, which scans the whole image.
+        """
+        self.load()
+        snapshot = SegmentationItem(None, visible=self.visible, color=self.color, alpha=self.alpha)
+        snapshot.geometry = self.get_geometry()
+        if self._segmentation is not None:
+            snapshot.store = TiledMaskStore.from_dense(get_numpy_view(self._segmentation)[0])
+        else:
+            snapshot.store = self.store.copy()
+        snapshot.contours = self.contours
+        return snapshot
+
+    def create_segmentation_image(self):
+        """A new dense vtkImageData of the mask. If the layer is not compact, the dense image itself is returned."""
+        self.load()
+        if self._segmentation is not None:
+            return self._segmentation
+
+        dims, spacing, origin, direction_matrix = self.geometry
+        segmentation = vtk.vtkImageData()
+        segmentation.SetDimensions(dims)
+        segmentation.SetSpacing(spacing)
+        segmentation.SetOrigin(origin)
+        segmentation.SetDirectionMatrix(direction_matrix)
+        segmentation.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 1)
+        self.store.to_dense(out=get_numpy_view(segmentation)[0])
+        return segmentation
+
+    def get_mask(self, region=None):
+        """The mask (uint8) within region (y_slice, x_slice; None for the whole image). A view if the layer is dense, else a copy."""
+        self.load()
+        if self._segmentation is not None:
+            mask = get_numpy_view(self._segmentation)[0]
+            return mask if region is None else mask[region]
+        return self.store[region]
+
+    def set_mask(self, region, values):
+        """Write values (nonzero -> 1) within region (y_slice, x_slice), in either representation."""
+        self.load()
+        if self._segmentation is not None:
+            get_numpy_view(self._segmentation)[0][region] = np.asarray(values) != 0
+        else:
+            self.store[region] = values
+
+    def bounding_box(self):
+        """Bounding box of the mask as (y_slice, x_slice), or None if it is empty."""
+        self.load()
+        if self._segmentation is not None:
+            return bounding_box(get_numpy_view(self._segmentation)[0])
+        return self.store.bounding_box()
+
+    def count(self):
+        """Number of labeled pixels."""
+        self.load()
+        if self._segmentation is not None:
+            return int(np.count_nonzero(get_numpy_view(self._segmentation)[0]))
+        return self.store.count()
+
+    def iter_mask_tiles(self):
+        """Yield (region, mask) pairs covering all labeled pixels: the occupied tiles of a compact layer,
+        or the bounding box of a dense one. Nothing is yielded for an empty mask."""
+        self.load()
+        if self._segmentation is not None:
+            region = self.bounding_box()
+            if region is not None:
+                yield region, get_numpy_view(self._segmentation)[0][region]
+        else:
+            yield from self.store.iter_tiles()
+
+    def get_color_table(self):
+        """RGBA (uint8) of background (row 0) and segmentation (row 1) pixels."""
+        return np.array([
+            [0, 0, 0, 0],  # Background: Transparent
+            [self.color[0], self.color[1], self.color[2], int(round(self.alpha * 255))]
+        ], dtype=np.uint8)
+
+    def create_colored_image(self):
+        """Allocate the RGBA image of the actor with the geometry of the mask (transparent) and display it."""
+        dims, spacing, origin, direction_matrix = self.get_geometry()
+        colored_image = vtk.vtkImageData()
+        colored_image.SetDimensions(dims)
+        colored_image.SetSpacing(spacing)
+        colored_image.SetOrigin(origin)
+        colored_image.SetDirectionMatrix(direction_matrix)
+        colored_image.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 4)
+        colored_image.GetPointData().GetScalars().Fill(0)
+        self.actor.GetMapper().SetInputData(colored_image)
+        return colored_image
+
+    def release_colors(self):
+        """
+        Replace the RGBA image of the actor by a placeholder, while the actor does not display the layer (the layer is
+        hidden, or composite mode is on). update_colors() rebuilds it from the labeled tiles.
+        """
+        if self.colors_outdated or self.actor is None:
+            return
+        self.actor.GetMapper().SetInputData(create_placeholder_image())
+        self.colors_outdated = True
+
+    def update_colors(self, region=None):
+        """Map the segmentation to the RGBA image of the actor, only within region (y_slice, x_slice) if given."""
+        # the RGBA image (4 bytes per pixel) is only kept while the layer is shown; a hidden layer is also not read
+        # from disk to be colored
+        if not self.visible:
+            self.release_colors()
+            return
+
+        # the first time, the RGBA image is allocated and only the labeled tiles are colored
+        if self.colors_outdated:
+            colored_image = self.create_colored_image()
+            colored = get_numpy_view(colored_image)[0]
+            color = self.get_color_table()[1]
+            for tile_region, mask in self.iter_mask_tiles():
+                colored[tile_region][mask != 0] = color
+            colored_image.Modified()
+            self.colors_outdated = False
+            return
+
+        if region is None:
+            region = (slice(None), slice(None))
+
+        colored_image = self.actor.GetMapper().GetInput()
+        colored = get_numpy_view(colored_image)[0]
+        mask = self.get_mask(region)
+
+        color_table = self.get_color_table()
+        colored[region] = np.where((mask != 0)[..., np.newaxis], color_table[1], color_table[0])
+
+        colored_image.Modified()
 
 from line_edit2 import LineEdit2
 
@@ -137,7 +386,7 @@ class SegmentationListItemWidget(QWidget):
 
         # Checkbox for visibility
         self.checkbox = QCheckBox()
-        self.checkbox.setChecked(True)
+        self.checkbox.setChecked(layer_data.visible)
         self.checkbox.stateChanged.connect(self.visible_checkbox_clicked)
         self.layout.addWidget(self.checkbox)
 
@@ -180,8 +429,7 @@ class SegmentationListItemWidget(QWidget):
 
     def visible_checkbox_clicked(self, state):
         visibility = state == Qt.Checked
-        self.layer_data.visible = visibility
-        self.layer_data.actor.SetVisibility(visibility)
+        self.manager.set_layer_visibility(self.layer_data, visibility)
         self.manager.on_layer_changed(self.layer_name)
 
     def get_layer_color_hex(self):
@@ -203,29 +451,12 @@ class SegmentationListItemWidget(QWidget):
         if color.isValid():
             
             c = [color.red(), color.green(), color.blue()]
-            # Update layer color
-            self.layer_data.color = c
+            # Update layer color (re-maps the layer, or edits the lookup table in composite mode)
+            self.manager.set_layer_color(self.layer_data, c)
             # Update color patch
             self.color_patch.setStyleSheet(f"background-color: {self.get_layer_color_hex()}; border: 1px solid black;")
             # Notify the viewer to update rendering
             #self.parent_viewer.on_layer_chagned(self.layer_name)
-            
-            # lookup table of the image actor
-            # Create a lookup table for coloring the segmentation
-            lookup_table = vtk.vtkLookupTable()
-            lookup_table.SetNumberOfTableValues(2)  # For 0 (background) and 1 (segmentation)
-            lookup_table.SetTableRange(0, 1)       # Scalar range
-            lookup_table.SetTableValue(0, 0, 0, 0, 0)  # Background: Transparent
-            lookup_table.SetTableValue(1, c[0]/255, c[1]/255, c[2]/255, self.layer_data.alpha)  # Segmentation: Red with 50% opacity
-            lookup_table.Build()
-            
-            mapper = vtk.vtkImageMapToColors()
-            mapper.SetInputData(self.layer_data.segmentation)
-            mapper.SetLookupTable(lookup_table)
-            mapper.Update()
-
-            actor = self.layer_data.actor
-            actor.GetMapper().SetInputConnection(mapper.GetOutputPort())
 
             self.manager.on_layer_changed(self.layer_name)
 
@@ -326,10 +557,34 @@ class SegmentationListManager(QObject):
         self.erase_active = False
         self.erase_brush_color = [0, 0.5, 1.0]
 
+        # bucket fill, optionally limited to an intensity window around the seed (% of the image intensity range)
+        self.fill_active = False
+
+        # region growing from a seed click (magic wand), within the same intensity window
+        self.wand_active = False
+        self.click_observer = None
+        self.intensity_window_enabled = False
+        self.intensity_window_percent = 10
+
         self.paintbrush = None
 
+        # composite mode: all layers are rendered through one label map actor (see SegmentationCompositor)
+        self.composite_mode = False
+        self.compositor = None
+
         self.color_rotator = ColorRotator()
 
+        # undo/redo of the paint and erase strokes
+        from config import get_config
+        self.undo_history = UndoHistory(max_bytes=get_config()['undo_memory_mb'] * 1024 * 1024)
+        self.stroke_recorder = None
+        self.left_button_is_pressed = False
+
+        # workspace data folder whose layer files are in sync with the unmodified layers (see save_state)
+        self.saved_data_dir = None
+        self.copied_layer_files = []  # (layer, segmentation path, contours path) of the layers copied by the pending save
+        self.saved_layer_files = []   # (layer, segmentation path) of the layers in place once the pending save is done
+
         self._modified = False
 
         logger.info("SegmentationListManager initialized")
@@ -346,8 +601,32 @@ class SegmentationListManager(QObject):
     def get_segmentation_vtk_images(self):
         vtk_images = []
         for _, layer_data in self.segmentation_layers.items():
-            vtk_images.append(layer_data.segmentation)
+            vtk_images.append(layer_data.create_segmentation_image())
         return vtk_images
+
+    def create_label_image(self):
+        """
+        A uint8 vtkImageData combining all layers into one label map (the i-th layer is label i+1, later layers
+        win where layers overlap, as in itk.combine_sitk_labels). Only the labeled tiles of each layer are visited.
+        """
+        if not self.segmentation_layers:
+            raise ValueError("There are no segmentation layers.")
+
+        base_image = self.get_base_vtk_image()
+        label_image = vtk.vtkImageData()
+        label_image.SetDimensions(base_image.GetDimensions())
+        label_image.SetSpacing(base_image.GetSpacing())
+        label_image.SetOrigin(base_image.GetOrigin())
+        label_image.SetDirectionMatrix(base_image.GetDirectionMatrix())
+        label_image.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 1)
+
+        label_map = get_numpy_view(label_image)[0]
+        label_map[...] = 0
+        for i, layer_data in enumerate(self.segmentation_layers.values()):
+            for region, mask in layer_data.iter_mask_tiles():
+                label_map[region][mask != 0] = i + 1
+
+        return label_image
     
     def reset_modified(self):
         self._modified = False
@@ -431,8 +710,24 @@ class SegmentationListManager(QObject):
         self.erase_action, self.erase_button = self.create_checkable_button("Erase", self.erase_active, None, self.toggle_erase_tool)
         button_layout.addWidget(self.erase_button)
 
+        self.fill_action, self.fill_button = self.create_checkable_button("Fill", self.fill_active, None, self.toggle_fill_tool)
+        button_layout.addWidget(self.fill_button)
+
+        self.wand_action, self.wand_button = self.create_checkable_button("Wand", self.wand_active, None, self.toggle_wand_tool)
+        button_layout.addWidget(self.wand_button)
+
         # Add the button layout 
         main_layout.addLayout(button_layout)
+
+        # Undo/Redo of the paint and erase strokes
+        undo_redo_layout = QHBoxLayout()
+        undo_button = QPushButton("Undo")
+        undo_button.clicked.connect(self.undo)
+        undo_redo_layout.addWidget(undo_button)
+        redo_button = QPushButton("Redo")
+        redo_button.clicked.connect(self.redo)
+        undo_redo_layout.addWidget(redo_button)
+        main_layout.addLayout(undo_redo_layout)
         
         from labeled_slider import LabeledSlider
         brush_size_slider = LabeledSlider("Brush Size:", initial_value=20)
@@ -440,6 +735,44 @@ class SegmentationListManager(QObject):
         brush_size_slider.slider.setMaximum(100)
         brush_size_slider.slider.valueChanged.connect(self.update_brush_size)
         main_layout.addWidget(brush_size_slider)
+
+        intensity_window_checkbox = QCheckBox("Limit to intensity window")
+        intensity_window_checkbox.setToolTip("Threshold brush and fill: only label pixels whose image intensity is within the window around the value under the cursor.")
+        intensity_window_checkbox.setChecked(self.intensity_window_enabled)
+        intensity_window_checkbox.toggled.connect(self.set_intensity_window_enabled)
+        main_layout.addWidget(intensity_window_checkbox)
+
+        intensity_window_slider = LabeledSlider("Intensity Window (%):", min_value=1, max_value=100, initial_value=self.intensity_window_percent)
+        intensity_window_slider.slider.valueChanged.connect(self.set_intensity_window_percent)
+        main_layout.addWidget(intensity_window_slider)
+
+        # morphology on the active layer (or all layers)
+        from itk import MORPHOLOGY_OPERATIONS
+        morphology_layout = QHBoxLayout()
+        self.morphology_combo = QComboBox()
+        self.morphology_combo.addItems(MORPHOLOGY_OPERATIONS)
+        morphology_layout.addWidget(self.morphology_combo)
+        self.morphology_radius_spinbox = QSpinBox()
+        self.morphology_radius_spinbox.setRange(1, 50)
+        self.morphology_radius_spinbox.setPrefix("r=")
+        morphology_layout.addWidget(self.morphology_radius_spinbox)
+        self.morphology_all_layers_checkbox = QCheckBox("All layers")
+        morphology_layout.addWidget(self.morphology_all_layers_checkbox)
+        morphology_button = QPushButton("Apply")
+        morphology_button.clicked.connect(self.morphology_clicked)
+        morphology_layout.addWidget(morphology_button)
+        main_layout.addLayout(morphology_layout)
+
+        # statistics of the active layer, updated while painting
+        self.statistics_label = QLabel()
+        self.statistics_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        main_layout.addWidget(self.statistics_label)
+
+        composite_checkbox = QCheckBox("Composite layers (single actor)")
+        composite_checkbox.setToolTip("Render all layers through one label map and lookup table (faster with many layers).")
+        composite_checkbox.setChecked(self.composite_mode)
+        composite_checkbox.toggled.connect(self.set_composite_mode)
+        main_layout.addWidget(composite_checkbox)
         
         # Set layout for the layer manager
         main_widget.setLayout(main_layout)
@@ -449,7 +782,7 @@ class SegmentationListManager(QObject):
         return dock
 
     def get_exclusive_actions(self):
-        return [self.paint_action, self.erase_action]
+        return [self.paint_action, self.erase_action, self.fill_action, self.wand_action]
     
     def clear(self):
         
@@ -458,11 +791,19 @@ class SegmentationListManager(QObject):
             print(f"removing actor of layer {layer_name}")
             actor = layer_data.actor
             self.vtk_renderer.RemoveActor(actor)    
+
+        # the label map has the geometry of the old image, a new one is created for the next layer
+        if self.compositor is not None:
+            self.vtk_renderer.RemoveActor(self.compositor.get_actor())
+            self.compositor = None
         
         self.vtk_image = None
         self._modified = False
         self.segmentation_layers.clear()
         self.list_widget.clear()
+        self.undo_history.clear()
+        self.statistics_label.setText("")
+        self.saved_data_dir = None
 
 
     def save_segmentation_layer(self, segmentation, file_path):
@@ -470,22 +811,133 @@ class SegmentationListManager(QObject):
         save_vtk_image_using_sitk(segmentation, file_path)
 
     def save_state(self,data_dict, data_dir):
+        from workspace_io import run_save_jobs
+        jobs = self.prepare_save(data_dict, data_dir)
+        try:
+            run_save_jobs(jobs)
+        except Exception:
+            self.save_finished(data_dir, False)
+            raise
+        self.save_finished(data_dir, True)
+
+    def prepare_save(self, data_dict, data_dir):
+        """
+        Add the layer metadata to data_dict and return the (file_path, write_fn) jobs that write the layer files
+        (run them with workspace_io.run_save_jobs(), then call save_finished()).
+        The jobs write snapshots of the layers, so they can run on a worker thread while the layers are edited.
+        Saving again to the folder the layers were loaded from/saved to only writes the modified layers, and the
+        layers whose file has another name (renamed layers).
+        """
         import os
+
         # Save segmentation layers as '.mha'
         data_dict["segmentations"] = {}
 
+        incremental = is_same_path(data_dir, self.saved_data_dir)
+        jobs = []
+        self.copied_layer_files = []
+        self.saved_layer_files = []
+
+        # (segmentation path, contours path) of each layer in data_dir
+        layer_paths = {layer_name: (os.path.join(data_dir, f"{layer_name}.mha"), os.path.join(data_dir, f"{layer_name}.contours.json"))
+                       for layer_name in self.segmentation_layers}
+
         for layer_name, layer_data in self.segmentation_layers.items():
-            segmentation_file = f"{layer_name}.mha"
-            segmentation_path = os.path.join(data_dir, segmentation_file )
-            self.save_segmentation_layer(layer_data.segmentation, segmentation_path)
+            # a layer left on disk is read now if its files are replaced by this save (e.g. two renamed layers
+            # swapping their names), the copy could otherwise read a file while it is being replaced
+            if not layer_data.is_loaded() and layer_data.load_error is None:
+                replaced = [path for other_name, paths in layer_paths.items() if other_name != layer_name for path in paths]
+                if any(is_same_path(layer_data.file_path, path) or is_same_path(layer_data.contours_file_path, path) for path in replaced):
+                    layer_data.load()
+
+        for layer_name, layer_data in self.segmentation_layers.items():
+            segmentation_path, contours_path = layer_paths[layer_name]
+            segmentation_file = os.path.basename(segmentation_path)
+
+            # outline polygons, for downstream analysis
+            contours_file = os.path.basename(contours_path)
+
+            if layer_data.load_error is not None and not layer_data.modified:
+                # the file of an unavailable layer is not replaced by an empty mask
+                logger.warning(f"Segmentation layer {layer_name} is unavailable ({layer_data.load_error}), its file is not saved")
+            elif not layer_data.is_loaded():
+                # a layer left on disk is unchanged, its files are copied to a new folder without decoding them
+                jobs += self.prepare_copy_layer_files(layer_name, layer_data, segmentation_path, contours_path)
+            elif not (incremental and not layer_data.modified and is_same_path(layer_data.saved_file_path, segmentation_path)
+                      and os.path.exists(segmentation_path)):
+                snapshot = layer_data.snapshot()
+                jobs.append((segmentation_path, lambda path, snapshot=snapshot: self.save_segmentation_layer(snapshot.create_segmentation_image(), path)))
+                jobs.append((contours_path, lambda path, layer_name=layer_name, snapshot=snapshot: self.save_layer_contours(layer_name, snapshot, path)))
+            elif not os.path.exists(contours_path):
+                snapshot = layer_data.snapshot()
+                jobs.append((contours_path, lambda path, layer_name=layer_name, snapshot=snapshot: self.save_layer_contours(layer_name, snapshot, path)))
+
+            if layer_data.load_error is None or layer_data.modified:
+                self.saved_layer_files.append((layer_data, segmentation_path))
 
             # Add layer metadata to the workspace data
             data_dict["segmentations"][layer_name] = {
                 "file": segmentation_file,
+                "contours": contours_file,
                 "color": list(layer_data.color),
                 "alpha": layer_data.alpha,
+                "visible": layer_data.visible,
             }
 
+        logger.info(f"Saving {len(jobs)} segmentation files for {len(self.segmentation_layers)} layers (the others are unchanged)")
+        return jobs
+
+    def prepare_copy_layer_files(self, layer_name, layer_data, segmentation_path, contours_path):
+        """Save jobs copying the files of a layer that is not loaded (nothing to do if they are already in place)."""
+        import os
+        import shutil
+
+        # the layer is read from the new files once they are saved
+        self.copied_layer_files.append((layer_data, segmentation_path, contours_path))
+
+        jobs = []
+        if not is_same_path(layer_data.file_path, segmentation_path):
+            jobs.append((segmentation_path, lambda path, source=layer_data.file_path: shutil.copyfile(source, path)))
+
+        source = layer_data.contours_file_path
+        if source is not None and os.path.exists(source):
+            if not is_same_path(source, contours_path):
+                jobs.append((contours_path, lambda path, source=source: shutil.copyfile(source, path)))
+        else:
+            jobs.append((contours_path, lambda path, layer_name=layer_name, snapshot=layer_data.snapshot(): self.save_layer_contours(layer_name, snapshot, path)))
+        return jobs
+
+    def save_finished(self, data_dir, success):
+        """Called when the jobs of prepare_save() are done. After a failure, the next save writes all layers again."""
+        self.saved_data_dir = data_dir if success else None
+
+        if success:
+            for layer_data, segmentation_path, contours_path in self.copied_layer_files:
+                layer_data.file_path = segmentation_path
+                layer_data.contours_file_path = contours_path
+            for layer_data, segmentation_path in self.saved_layer_files:
+                layer_data.saved_file_path = segmentation_path
+        self.copied_layer_files = []
+        self.saved_layer_files = []
+
+    def prepare_load(self, data_dict, data_dir):
+        """
+        The (file_path, read_fn) jobs reading the layer files needed when the workspace is opened: the visible layers
+        and the last one (that becomes active). Run them with workspace_io.run_load_jobs() and pass the results to
+        load_state() as aux_data['loaded'].
+        """
+        import os
+        from itkvtk import load_vtk_image_using_sitk
+
+        layers = list(data_dict.get("segmentations", {}).values())
+        jobs = []
+        for i, layer_metadata in enumerate(layers):
+            if layer_metadata.get("visible", True) or i == len(layers) - 1:
+                seg_path = os.path.join(data_dir, layer_metadata["file"])
+                if os.path.exists(seg_path):
+                    jobs.append((seg_path, load_vtk_image_using_sitk))
+        return jobs
+
     def load_state(self, data_dict, data_dir, aux_data):
         import os
 
@@ -493,36 +945,210 @@ class SegmentationListManager(QObject):
 
         self.vtk_image = aux_data['base_image']
 
-        # Load segmentation layers
-        from itkvtk import load_vtk_image_using_sitk
+        # layer images already read by the jobs of prepare_load() (file path -> image, or the exception of the read)
+        loaded = aux_data.get('loaded', {})
+
+        # Add the segmentation layers. Only the visible layers are read now, the hidden ones stay on disk until
+        # their pixels are needed (shown, activated, exported...)
         for layer_name, layer_metadata in data_dict.get("segmentations", {}).items():
             seg_path = os.path.join(data_dir, layer_metadata["file"])
             if os.path.exists(seg_path):
                 try:
-                    vtk_seg = load_vtk_image_using_sitk(seg_path)
-
-                    self.add_layer(
-                        segmentation=vtk_seg,
-                        layer_name=layer_name,
-                        color_vtk=to_vtk_color(layer_metadata["color"]),
-                        alpha=layer_metadata["alpha"]
-                    )
-                    
+                    layer_data = SegmentationItem(
+                        segmentation=None,
+                        visible=layer_metadata.get("visible", True),
+                        color=list(layer_metadata["color"]),
+                        alpha=layer_metadata["alpha"],
+                        actor=self.create_segmentation_actor(),
+                        file_path=seg_path)
+                    layer_data.saved_file_path = seg_path
+                    layer_data.geometry = self.get_base_geometry()  # geometry of the layer if its file cannot be read
+                    layer_data.on_load_error = self.on_layer_load_error
+                    if "contours" in layer_metadata:
+                        layer_data.contours_file_path = os.path.join(data_dir, layer_metadata["contours"])
+                    segmentation = loaded.get(seg_path)
+                    if isinstance(segmentation, Exception):
+                        raise segmentation
+                    if layer_data.visible or segmentation is not None:
+                        layer_data.load(segmentation)
+
+                    self.add_layer_data(layer_name, layer_data)
+
                 except Exception as e:
                     self.print_status(f"Failed to load segmentation layer {layer_name}: {e}")
             else:
                 self.print_status(f"Segmentation file for layer {layer_name} not found.")
 
+        # the layer files in data_dir match the loaded layers
+        self.saved_data_dir = data_dir
+
+        self.update_statistics_panel()
+
+    def on_layer_load_error(self, layer_data, error):
+        """A layer left on disk could not be read when its pixels were first needed (may be called from a worker thread)."""
+        self.log_message.emit("ERROR", f"Failed to read the segmentation layer file {layer_data.file_path}: {error}. "
+                                       "The layer is unavailable (empty), its file is not overwritten unless the layer is edited.")
+
     def render(self):
-        self.vtk_renderer.GetRenderWindow().Render()
+        self.vtk_viewer.request_render()
 
     def on_layer_changed(self, layer_name):
         self._modified = True
         self.render()
 
+    def on_segmentation_modified(self, layer_data, region=None, before=None):
+        """
+        Propagate a change of the segmentation pixels within region (y_slice, x_slice; None for the whole image) to the display.
+        before: the pixels of region before the change, if known, to update the layer statistics incrementally.
+        """
+        if layer_data.statistics is not None:
+            if region is not None and before is not None:
+                layer_data.statistics.update(region, before, layer_data.get_mask(region), self.get_intensity())
+            else:
+                layer_data.statistics = None
+
+        # the cached outlines are re-extracted on next use
+        layer_data.contours = None
+
+        if not layer_data.is_compact():
+            layer_data.segmentation.Modified() # flag vtkImageData as Modified to update the pipeline.
+
+        # only the modified region is re-mapped to colors (or re-packed in composite mode)
+        if self.composite_mode:
+            self.compositor.composite(self.segmentation_layers.values(), region)
+        else:
+            layer_data.update_colors(region)
+
+        layer_data.modified = True
+        self._modified = True
+
+        if layer_data is self.get_active_layer():
+            self.update_statistics_panel()
+
+    def get_intensity(self):
+        """The (y, x) intensity view of the base image (first component)."""
+        intensity = get_numpy_view(self.get_base_image())[0]
+        return intensity[..., 0] if intensity.ndim == 3 else intensity
+
+    def get_layer_statistics(self, layer_data):
+        """The LayerStatistics of a layer, computed from its labeled tiles on first use."""
+        if layer_data.statistics is None:
+            layer_data.statistics = LayerStatistics.from_layer(layer_data, self.get_intensity())
+        return layer_data.statistics
+
+    def get_layer_contours(self, layer_data):
+        """
+        The outlines of a layer as a list of polygons ({"points": [[x, y], ...], "hole": bool} in world coordinates,
+        see extract_contours()). They are extracted within the bounding box of the layer and cached until the layer
+        is modified.
+        """
+        if layer_data.contours is None:
+            box = layer_data.bounding_box()
+            if box is None:
+                layer_data.contours = []
+            else:
+                dims, spacing, origin, _ = layer_data.get_geometry()
+                region = pad_region(box, 1, (dims[1], dims[0]))
+                layer_data.contours = extract_contours(layer_data.get_mask(region), region, spacing, origin)
+        return layer_data.contours
+
+    def save_layer_contours(self, layer_name, layer_data, file_path):
+        import json
+        with open(file_path, "w") as f:
+            json.dump({"layer": layer_name, "coordinates": "world", "winding": "outer counterclockwise, holes clockwise",
+                       "polygons": self.get_layer_contours(layer_data)}, f)
+
+    def update_statistics_panel(self):
+        layer_data = self.get_active_layer()
+        if layer_data is None or self.get_base_image() is None:
+            self.statistics_label.setText("")
+            return
+
+        base_image = self.get_base_image()
+        stats = self.get_layer_statistics(layer_data).get_summary(base_image.GetSpacing(), base_image.GetOrigin())
+        if stats["count"] == 0:
+            self.statistics_label.setText(f"{self.active_layer_name}: empty")
+            return
+
+        x0, y0, x1, y1 = stats["bounding_box"]
+        self.statistics_label.setText(
+            f"{self.active_layer_name}\n"
+            f"Area: {stats['area']:.2f} ({stats['count']} pixels)\n"
+            f"Centroid: ({stats['centroid'][0]:.2f}, {stats['centroid'][1]:.2f})\n"
+            f"Bounding box: [{x0}, {y0}] - [{x1}, {y1}]\n"
+            f"Intensity: {stats['mean']:.2f} \u00b1 {stats['std']:.2f}")
+
     def get_active_layer(self):
         return self.segmentation_layers.get(self.active_layer_name, None)
 
+    def compact_inactive_layers(self):
+        """Bit-pack the masks of all layers but the active one (the active layer is materialized when it is painted)."""
+        for layer_name, layer_data in self.segmentation_layers.items():
+            if layer_name != self.active_layer_name:
+                layer_data.compact()
+
+    def set_layer_visibility(self, layer_data, visible):
+        layer_data.visible = visible
+        if self.composite_mode:
+            self.compositor.update_layer(layer_data, self.segmentation_layers.values())
+        else:
+            # the colors of a hidden layer are released, and rebuilt from its tiles (or its file) when it is shown
+            if not visible:
+                layer_data.release_colors()
+            elif layer_data.colors_outdated:
+                layer_data.update_colors()
+            layer_data.actor.SetVisibility(visible)
+
+    def set_layer_color(self, layer_data, color):
+        layer_data.color = color
+        if self.composite_mode:
+            self.compositor.update_layer(layer_data, self.segmentation_layers.values())
+        else:
+            layer_data.update_colors()
+
+    def get_compositor(self):
+        """The compositor of composite mode, created (empty) on first use for the current base image."""
+        if self.compositor is None:
+            from segmentation_compositor import SegmentationCompositor
+            self.compositor = SegmentationCompositor(self.get_base_image())
+            self.vtk_renderer.AddActor(self.compositor.get_actor())
+        return self.compositor
+
+    def set_composite_mode(self, enabled):
+        """Switch between one actor per layer and a single composite actor for all layers."""
+        if enabled == self.composite_mode:
+            return
+
+        if enabled:
+            if len(self.segmentation_layers) > 0:
+                compositor = self.get_compositor()
+                for layer_data in self.segmentation_layers.values():
+                    if not compositor.add_layer(layer_data):
+                        self.log_message.emit("WARNING", f"Composite mode supports up to {compositor.MAX_LAYERS} layers.")
+                        self.vtk_renderer.RemoveActor(compositor.get_actor())
+                        self.compositor = None
+                        return
+                compositor.composite(self.segmentation_layers.values())
+
+            # the actors of the layers are not displayed, their colors are rebuilt when composite mode is turned off
+            for layer_data in self.segmentation_layers.values():
+                self.vtk_renderer.RemoveActor(layer_data.actor)
+                layer_data.release_colors()
+        else:
+            if self.compositor is not None:
+                self.vtk_renderer.RemoveActor(self.compositor.get_actor())
+                self.compositor = None
+
+            # the colored images are not updated in composite mode
+            for layer_data in self.segmentation_layers.values():
+                layer_data.update_colors()
+                layer_data.actor.SetVisibility(layer_data.visible)
+                self.vtk_renderer.AddActor(layer_data.actor)
+
+        self.composite_mode = enabled
+        self.print_status(f"Composite layers {'enabled' if enabled else 'disabled'}")
+        self.render()
+
     def enable_paintbrush(self, enabled=True):
         
         if self.paintbrush is None:
@@ -544,6 +1170,7 @@ class SegmentationListManager(QObject):
         
         self.left_button_is_pressed = False
         self.last_mouse_position = None
+        self.last_paint_position = None
         
         print(f"Painbrush mode: {'enabled' if enabled else 'disabled'}")
 
@@ -551,35 +1178,29 @@ class SegmentationListManager(QObject):
     def paint_at_mouse_position(self):
         
         vtk_viewer = self.vtk_viewer
-        vtk_image = vtk_viewer.vtk_image
+        coordinates = vtk_viewer.coordinates
         
         mouse_pos = vtk_viewer.interactor.GetEventPosition()
-        picker = vtk.vtkWorldPointPicker()
-        picker.Pick(mouse_pos[0], mouse_pos[1], 0, vtk_viewer.get_renderer())
-        world_pos = picker.GetPickPosition()
+        world_pos = coordinates.pick(mouse_pos[0], mouse_pos[1])
 
-        print(f"World position: ({world_pos[0]:.2f}, {world_pos[1]:.2f}, {world_pos[2]:.2f})"
-              f"Mouse position: ({mouse_pos[0]:.2f}, {mouse_pos[1]:.2f})")
+        trace("World position: (%.2f, %.2f, %.2f) Mouse position: (%d, %d)",
+              world_pos[0], world_pos[1], world_pos[2], mouse_pos[0], mouse_pos[1])
         
-        dims = vtk_image.GetDimensions()
-        spacing = vtk_image.GetSpacing()
-        origin = vtk_image.GetOrigin()
-
-        print(f"Image dimensions: {dims}")
-        print(f"Image spacing: {spacing}")
-        print(f"Image origin: {origin}")
+        dims, spacing, origin = coordinates.get_geometry()
 
-        x = int((world_pos[0] - origin[0]) / spacing[0] + 0.49999999)
-        y = int((world_pos[1] - origin[1]) / spacing[1] + 0.49999999)
+        trace("Image dimensions: %s, spacing: %s, origin: %s", dims, spacing, origin)
 
+        index = coordinates.world_to_index(world_pos)
+        x, y = int(index[0]), int(index[1])
 
-        if not (0 <= x < dims[0] and 0 <= y < dims[1]):
-            print(f"Point ({x}, {y}) is outside the image bounds.")
+        # a stroke that leaves the image is still painted up to the image border
+        if not (0 <= x < dims[0] and 0 <= y < dims[1]) and self.last_paint_position is None:
+            trace("Point (%d, %d) is outside the image bounds.", x, y)
             return
 
         layer = self.get_active_layer()
         if layer is None:
-            print("No active layer selected.")
+            trace("No active layer selected.")
             return
 
         segmentation = layer.segmentation
@@ -590,22 +1211,146 @@ class SegmentationListManager(QObject):
         else:
             value = 0
 
-        self.paintbrush.paint(segmentation, x, y, value)
-        
-        segmentation.Modified() # flag vtkImageData as Modified to update the pipeline.
-        
-        self._modified = True
+        # save the pixels the brush is about to touch, for undo and the incremental statistics (if they are computed)
+        last_x, last_y = self.last_paint_position if self.last_paint_position is not None else (x, y)
+        brush_region = self.paintbrush.get_stroke_region(segmentation, last_x, last_y, x, y)
+        if self.stroke_recorder is not None:
+            self.stroke_recorder.capture(brush_region)
+        before = None
+        if brush_region is not None and layer.statistics is not None:
+            before = get_numpy_view(segmentation)[0][brush_region].copy()
+
+        # threshold brush: only the pixels in the intensity window around the value under the cursor
+        window = self.get_intensity_window(x, y) if self.intensity_window_enabled else None
+
+        # connect to the previous position of the stroke, so fast strokes leave no gaps
+        if self.last_paint_position is None:
+            region = self.paintbrush.paint(segmentation, x, y, value, window)
+        else:
+            last_x, last_y = self.last_paint_position
+            region = self.paintbrush.paint_stroke(segmentation, last_x, last_y, x, y, value, window)
+        self.last_paint_position = (x, y)
+
+        if region is None:
+            return
+
+        self.on_segmentation_modified(layer, region, before)
+
         self.render()
 
+    def get_pixel_at_mouse_position(self):
+        """(x, y) index of the image pixel under the mouse, or None if it is outside the image."""
+        coordinates = self.vtk_viewer.coordinates
+        mouse_pos = self.vtk_viewer.interactor.GetEventPosition()
+        index = coordinates.world_to_index(coordinates.pick(mouse_pos[0], mouse_pos[1]))
+        dims, _, _ = coordinates.get_geometry()
+
+        x, y = int(index[0]), int(index[1])
+        if not (0 <= x < dims[0] and 0 <= y < dims[1]):
+            return None
+        return x, y
+
+    def on_click_tool_left_button_press(self, obj, event):
+        pixel = self.get_pixel_at_mouse_position()
+        if pixel is None:
+            return
+
+        if self.fill_active:
+            layer = self.get_active_layer()
+            if layer is not None:
+                self.fill(layer, pixel[0], pixel[1])
+        elif self.wand_active:
+            self.grow_region(pixel[0], pixel[1])
+
+    def fill(self, layer_data, x, y):
+        """
+        Bucket fill: label the unlabeled pixels connected to (x, y), bounded by the labeled pixels of the layer
+        (and by the intensity window, if enabled). The filled area is one undo step.
+        """
+        mask = get_numpy_view(layer_data.segmentation)[0]
+        if mask[y, x] != 0:
+            self.print_status("The pixel is already labeled")
+            return
+
+        candidates = mask == 0
+        if self.intensity_window_enabled:
+            candidates &= self.get_intensity_mask(x, y)
+
+        from itk import connected_threshold
+        filled = connected_threshold(candidates.view(np.uint8), (x, y), 1, 1)
+
+        region = bounding_box(filled)
+        self.commit_mask_change(layer_data, region, mask[region] | filled[region])
+        self.print_status(f"Filled {int(np.count_nonzero(filled))} pixels")
+
+    def grow_region(self, x, y):
+        """
+        Magic wand: grow the region of pixels connected to (x, y) within the intensity window around its value
+        and merge it into the active layer (a new layer is added if there is none). The merge is one undo step.
+        """
+        if self.get_active_layer() is None:
+            self.add_layer_clicked()
+        layer_data = self.get_active_layer()
+
+        intensity, lower, upper = self.get_intensity_window(x, y)
+        from itk import grow_region
+        region, grown = grow_region(intensity, (x, y), lower, upper)
+
+        mask = layer_data.get_mask(region)
+        self.commit_mask_change(layer_data, region, mask | grown)
+        self.print_status(f"Region grown: {int(np.count_nonzero(grown))} pixels")
+
+    def morphology_clicked(self):
+        self.apply_morphology(
+            self.morphology_combo.currentText(),
+            self.morphology_radius_spinbox.value(),
+            self.morphology_all_layers_checkbox.isChecked())
+
+    def apply_morphology(self, operation, radius=1, all_layers=False):
+        """
+        Apply a binary morphology operation (itk.MORPHOLOGY_OPERATIONS) to the active layer, or to all layers.
+        Each layer is processed within its bounding box grown by the kernel radius, and several layers are processed
+        in a thread pool (SimpleITK releases the GIL). The result is one undo step.
+        """
+        if all_layers:
+            layers = list(self.segmentation_layers.values())
+        else:
+            layers = [layer for layer in [self.get_active_layer()] if layer is not None]
+        if not layers:
+            return
+
+        dims = self.get_base_image().GetDimensions()
+        from itk import binary_morphology
+
+        def run(layer_data):
+            box = layer_data.bounding_box()
+            if box is None:
+                return None
+            region = pad_region(box, radius + 1, (dims[1], dims[0]))
+            return layer_data, region, binary_morphology(layer_data.get_mask(region), operation, radius)
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor() as executor:
+            changes = [change for change in executor.map(run, layers) if change is not None]
+
+        if self.commit_mask_changes(changes):
+            self.print_status(f"Applied {operation} (radius {radius}) to {len(changes)} layer(s)")
+        else:
+            self.print_status(f"{operation} did not change the layer(s)")
+
     def on_left_button_press(self, obj, event):
         if not self.paintbrush.enabled:
             return
         
         self.left_button_is_pressed = True
         self.last_mouse_position = self.vtk_viewer.interactor.GetEventPosition()
+        self.last_paint_position = None
         
         if self.left_button_is_pressed and self.paintbrush.enabled and self.active_layer_name is not None:
-            print('paint...')
+            layer = self.get_active_layer()
+            self.stroke_recorder = StrokeRecorder(layer, get_numpy_view(layer.segmentation)[0])
+
+            trace('paint...')
             self.paint_at_mouse_position()
        
     def on_mouse_move(self, obj, event):
@@ -614,11 +1359,9 @@ class SegmentationListManager(QObject):
 
         if self.paintbrush.enabled:
             mouse_pos = self.vtk_viewer.interactor.GetEventPosition()
-            picker = vtk.vtkWorldPointPicker()
-            picker.Pick(mouse_pos[0], mouse_pos[1], 0, self.vtk_viewer.get_renderer())
 
             # Get world position
-            world_pos = picker.GetPickPosition()
+            world_pos = self.vtk_viewer.coordinates.pick(mouse_pos[0], mouse_pos[1])
 
             # Update the brush position (ensure Z remains on the image plane + 0.1 to show on top of the image)
             self.paintbrush.get_actor().SetPosition(world_pos[0], world_pos[1], world_pos[2] + 0.1)
@@ -631,8 +1374,9 @@ class SegmentationListManager(QObject):
 
             # Paint 
             if self.left_button_is_pressed and self.paintbrush.enabled and self.active_layer_name is not None:
-                print('paint...')
+                trace('paint...')
                 self.paint_at_mouse_position()
+                self.last_mouse_position = mouse_pos
         else:
             self.paintbrush.get_actor().SetVisibility(False)  # Hide the brush when not painting
        
@@ -642,6 +1386,65 @@ class SegmentationListManager(QObject):
         
         self.left_button_is_pressed = False
         self.last_mouse_position = None
+        self.last_paint_position = None
+
+        # the stroke becomes one undo step
+        if self.stroke_recorder is not None:
+            edit = self.stroke_recorder.finish()
+            self.stroke_recorder = None
+            if edit is not None:
+                self.undo_history.push([edit])
+
+    def undo(self):
+        """Revert the last undo step (a stroke, a fill or a layer operation)."""
+        if self.left_button_is_pressed:
+            return
+        step = self.undo_history.pop_undo()
+        if step is None:
+            self.print_status("Nothing to undo")
+            return
+        for edit in reversed(step):
+            self.apply_mask_edit(edit, edit.get_before())
+        self.render()
+        self.print_status("Undo")
+
+    def redo(self):
+        """Re-apply the last undone step."""
+        if self.left_button_is_pressed:
+            return
+        step = self.undo_history.pop_redo()
+        if step is None:
+            self.print_status("Nothing to redo")
+            return
+        for edit in step:
+            self.apply_mask_edit(edit, edit.get_after())
+        self.render()
+        self.print_status("Redo")
+
+    def commit_mask_change(self, layer_data, region, values):
+        """Write values (uint8) within region (y_slice, x_slice) of a layer as one undo step. Returns False if nothing changed."""
+        return self.commit_mask_changes([(layer_data, region, values)])
+
+    def commit_mask_changes(self, changes):
+        """Write (layer, region, values) changes as one undo step. Returns False if nothing changed."""
+        edits = []
+        for layer_data, region, values in changes:
+            edit = MaskEdit.from_arrays(layer_data, region, layer_data.get_mask(region).copy(), values)
+            if edit is not None:
+                edits.append(edit)
+        if not edits:
+            return False
+
+        self.undo_history.push(edits)
+        for edit in edits:
+            self.apply_mask_edit(edit, edit.get_after())
+        self.render()
+        return True
+
+    def apply_mask_edit(self, edit, values):
+        before = edit.layer_data.get_mask(edit.region).copy()
+        edit.layer_data.set_mask(edit.region, values)
+        self.on_segmentation_modified(edit.layer_data, edit.region, before)
 
     def create_checkable_button(self, label, checked, toolbar, on_toggled_fn):
         action = QAction(label)
@@ -685,6 +1488,8 @@ class SegmentationListManager(QObject):
                 layer_name = item_widget.layer_name
                 if self.active_layer_name != layer_name:
                     self.active_layer_name = layer_name
+                    self.compact_inactive_layers()
+                    self.update_statistics_panel()
                     self.print_status(f"Layer {layer_name} selected")
                     
 
@@ -694,9 +1499,8 @@ class SegmentationListManager(QObject):
         if self.paint_active == checked:
             return 
         
-        # turn off both
-        self.erase_action.setChecked(False)
-        self.paint_action.setChecked(False)
+        # turn off the other tools
+        self.uncheck_tool_actions()
 
         self.paint_active = checked
         self.paint_action.setChecked(checked)
@@ -714,9 +1518,8 @@ class SegmentationListManager(QObject):
         if self.erase_active == checked:
             return 
 
-        # turn off both
-        self.erase_action.setChecked(False)
-        self.paint_action.setChecked(False)
+        # turn off the other tools
+        self.uncheck_tool_actions()
 
         self.erase_active = checked
         self.erase_action.setChecked(checked)
@@ -728,6 +1531,87 @@ class SegmentationListManager(QObject):
 
         self.enable_paintbrush(self.paint_active or self.erase_active)
 
+    def toggle_fill_tool(self, checked):
+
+        # no change, just return
+        if self.fill_active == checked:
+            return
+
+        # turn off the other tools
+        self.uncheck_tool_actions()
+
+        self.fill_active = checked
+        self.fill_action.setChecked(checked)
+
+        if self.fill_active:
+            self.print_status("Fill tool activated")
+        else:
+            self.print_status("Fill tool deactivated")
+
+        self.enable_click_tool(self.fill_active or self.wand_active)
+
+    def toggle_wand_tool(self, checked):
+
+        # no change, just return
+        if self.wand_active == checked:
+            return
+
+        # turn off the other tools
+        self.uncheck_tool_actions()
+
+        self.wand_active = checked
+        self.wand_action.setChecked(checked)
+
+        if self.wand_active:
+            self.print_status("Wand tool activated")
+        else:
+            self.print_status("Wand tool deactivated")
+
+        self.enable_click_tool(self.fill_active or self.wand_active)
+
+    def uncheck_tool_actions(self):
+        for action in self.get_exclusive_actions():
+            action.setChecked(False)
+
+    def enable_click_tool(self, enabled):
+        """Observe left clicks for the single-click tools (fill, wand)."""
+        interactor = self.vtk_viewer.interactor
+        if enabled and self.click_observer is None:
+            self.click_observer = interactor.AddObserver("LeftButtonPressEvent", self.on_click_tool_left_button_press)
+        elif not enabled and self.click_observer is not None:
+            interactor.RemoveObserver(self.click_observer)
+            self.click_observer = None
+
+    def set_intensity_window_enabled(self, enabled):
+        self.intensity_window_enabled = enabled
+
+    def set_intensity_window_percent(self, value):
+        self.intensity_window_percent = value
+
+    def get_intensity_window(self, x, y):
+        """
+        (intensity, lower, upper): the (y, x) intensity view of the base image and the intensity window around
+        the value at (x, y), clamped to the image. The window half-width is intensity_window_percent of the
+        scalar range of the image.
+        """
+        base_image = self.get_base_image()
+        intensity = get_numpy_view(base_image)[0]
+        if intensity.ndim == 3:
+            intensity = intensity[..., 0]
+
+        scalar_range = base_image.GetScalarRange()
+        half_width = (scalar_range[1] - scalar_range[0]) * self.intensity_window_percent / 100.0
+        center = float(intensity[min(max(y, 0), intensity.shape[0] - 1), min(max(x, 0), intensity.shape[1] - 1)])
+
+        return intensity, center - half_width, center + half_width
+
+    def get_intensity_mask(self, x, y, region=None):
+        """Boolean mask (within region, or the whole image) of the base image pixels in the intensity window around the value at (x, y)."""
+        intensity, lower, upper = self.get_intensity_window(x, y)
+        if region is not None:
+            intensity = intensity[region]
+        return (intensity >= lower) & (intensity <= upper)
+
     def get_status_bar(self):
         return self._mainwindow.status_bar
     
@@ -761,10 +1645,29 @@ class SegmentationListManager(QObject):
         return f"{base_name} {index}"
     
     def add_layer(self, segmentation, layer_name, color_vtk, alpha):
-        actor = self.create_segmentation_actor(segmentation, color=color_vtk, alpha=alpha)
+        actor = self.create_segmentation_actor()
         layer_data = SegmentationItem(segmentation=segmentation, color=from_vtk_color(color_vtk), alpha=alpha, actor=actor)
-        self.segmentation_layers[layer_name] = layer_data
-        self.vtk_renderer.AddActor(actor)
+        self.add_layer_data(layer_name, layer_data)
+
+    def add_layer_data(self, layer_name, layer_data):
+        """Add a layer (SegmentationItem with its actor) on top of the others and make it active."""
+        layer_data.modified = True  # not saved yet (cleared by reset_modified() after a load or save)
+
+        if self.composite_mode:
+            if not self.get_compositor().add_layer(layer_data):
+                self.log_message.emit("WARNING", f"Composite mode supports up to {self.compositor.MAX_LAYERS} layers.")
+                return
+            self.segmentation_layers[layer_name] = layer_data
+
+            # the new layer is on top, only its pixels change the label map
+            region = layer_data.bounding_box() if layer_data.is_loaded() else None
+            if region is not None:
+                self.compositor.composite(self.segmentation_layers.values(), region)
+        else:
+            layer_data.update_colors()
+            layer_data.actor.SetVisibility(layer_data.visible)
+            self.segmentation_layers[layer_name] = layer_data
+            self.vtk_renderer.AddActor(layer_data.actor)
         self.vtk_renderer.GetRenderWindow().Render()
 
         self.add_layer_widget_item(layer_name, layer_data)
@@ -773,6 +1676,9 @@ class SegmentationListManager(QObject):
         if self.list_widget.count() > 0:
             self.list_widget.setCurrentRow(self.list_widget.count() - 1)
 
+        # the new layer is active, the others are kept bit-packed
+        self.compact_inactive_layers()
+
         self._modified = True
 
     def add_layer_clicked(self):
@@ -792,6 +1698,7 @@ class SegmentationListManager(QObject):
             color_vtk=[layer_color[0]/255, layer_color[1]/255, layer_color[2]/255],
             alpha=0.8)
         
+        self.update_statistics_panel()
         self.print_status(f'A layer added: {layer_name}, and active layer is now {self.active_layer_name}')
         
 
@@ -799,11 +1706,19 @@ class SegmentationListManager(QObject):
         
         if layer_name in self.segmentation_layers:
             # remove actor
-            actor = self.segmentation_layers[layer_name].actor
-            self.vtk_renderer.RemoveActor(actor)
+            layer_data = self.segmentation_layers[layer_name]
+            self.vtk_renderer.RemoveActor(layer_data.actor)
 
             # Remove from the data list
             del self.segmentation_layers[layer_name]
+            self.undo_history.discard_layer(layer_data)
+
+            # re-pack the pixels of the removed layer
+            if self.composite_mode:
+                self.compositor.remove_layer(layer_data)
+                region = layer_data.bounding_box() if layer_data.is_loaded() else None
+                if region is not None:
+                    self.compositor.composite(self.segmentation_layers.values(), region)
 
             # Remove from the list widget
             item, _ = self.find_list_widget_item_by_text(layer_name)
@@ -817,6 +1732,7 @@ class SegmentationListManager(QObject):
                 self.list_widget.setCurrentRow(self.list_widget.count() - 1)
 
             self._modified = True
+            self.update_statistics_panel()
 
             self.vtk_renderer.GetRenderWindow().Render()
         else:
@@ -874,6 +1790,11 @@ class SegmentationListManager(QObject):
 
     def get_base_image(self):
         return self.vtk_viewer.vtk_image
+
+    def get_base_geometry(self):
+        """(dimensions, spacing, origin, direction matrix) of the base image, shared by the layers."""
+        base_image = self.get_base_image()
+        return (base_image.GetDimensions(), base_image.GetSpacing(), base_image.GetOrigin(), base_image.GetDirectionMatrix())
     
     def create_empty_segmentation(self):
         """Create an empty segmentation as vtkImageData with the same geometry as the base image."""
@@ -903,22 +1824,12 @@ class SegmentationListManager(QObject):
 
         return segmentation
 
-    def create_segmentation_actor(self, segmentation, color=(1, 0, 0), alpha=0.8):
-        """Create a VTK actor for a segmentation layer."""
-        # Create a lookup table for coloring the segmentation
-        lookup_table = vtk.vtkLookupTable()
-        lookup_table.SetNumberOfTableValues(2)  # For 0 (background) and 1 (segmentation)
-        lookup_table.SetTableRange(0, 1)       # Scalar range
-        lookup_table.SetTableValue(0, 0, 0, 0, 0)  # Background: Transparent
-        lookup_table.SetTableValue(1, color[0], color[1], color[2], alpha)  # Segmentation: Red with 50% opacity
-        lookup_table.Build()
-        
-        mapper = vtk.vtkImageMapToColors()
-        mapper.SetInputData(segmentation)
-        mapper.SetLookupTable(lookup_table)
-        mapper.Update()
-
+    def create_segmentation_actor(self):
+        """
+        Create a VTK actor for a segmentation layer. The actor displays an RGBA image that is allocated and filled by
+        SegmentationItem.update_colors() when the layer is first colored; until then it shows a transparent 1x1 placeholder.
+        """
         actor = vtk.vtkImageActor()
-        actor.GetMapper().SetInputConnection(mapper.GetOutputPort())
+        actor.GetMapper().SetInputData(create_placeholder_image())
               
         return actor
@@ -1,4 +1,6 @@
 import vtk
+import numpy as np
+from vtk.util.numpy_support import numpy_to_vtk, vtk_to_numpy
 
 def to_vtk_color(c):
     return [c[0]/255, c[1]/255, c[2]/255]
@@ -6,6 +8,17 @@ def to_vtk_color(c):
 def from_vtk_color(c):
     return [int(c[0]*255), int(c[1]*255), int(c[2]*255)]
 
+def get_numpy_view(vtk_image):
+    """Return a zero-copy NumPy view (z, y, x) of the scalars of a vtkImageData (an extra trailing axis for multi-component scalars)."""
+    dims = vtk_image.GetDimensions()
+    scalars = vtk_image.GetPointData().GetScalars()
+    array = vtk_to_numpy(scalars)
+
+    num_components = scalars.GetNumberOfComponents()
+    if num_components == 1:
+        return array.reshape(dims[::-1])
+    return array.reshape(dims[::-1] + (num_components,))
+
 def remove_widget(widget, renderer):
     if widget:
         # Disable the widget
@@ -32,4 +45,79 @@ def remove_widget(widget, renderer):
         widget = None
 
         # Trigger re-rendering of the scene
-        renderer.GetRenderWindow().Render()
\ No newline at end of file
+        renderer.GetRenderWindow().Render()
+
+
+def extract_contours(mask, region, spacing, origin):
+    """
+    Outlines of a 2D binary mask as closed polygons, by marching squares (vtkFlyingEdges2D) at the 0.5 level.
+
+    mask: the (y, x) mask within region (y_slice, x_slice) of an image with the given spacing and origin.
+    Returns a list of polygons, each a dict with "points" (a list of [x, y] world coordinates) and "hole" (True if the
+    polygon bounds a hole of the polygon around it). Outer boundaries are counterclockwise and holes clockwise, so
+    the mask is on the left of each polygon and the signed area of a hole is negative.
+    """
+    # a 1 pixel empty border closes the contours at the border of the region
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1] + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = mask != 0
+
+    image = vtk.vtkImageData()
+    image.SetDimensions(padded.shape[1], padded.shape[0], 1)
+    image.SetSpacing(spacing[0], spacing[1], 1.0)
+    image.SetOrigin(origin[0] + (region[1].start - 1) * spacing[0], origin[1] + (region[0].start - 1) * spacing[1], 0.0)
+    image.GetPointData().SetScalars(numpy_to_vtk(padded.ravel(), deep=True, array_type=vtk.VTK_UNSIGNED_CHAR))
+
+    contour = vtk.vtkFlyingEdges2D()
+    contour.SetInputData(image)
+    contour.SetValue(0, 0.5)
+
+    # join the line segments into polylines
+    stripper = vtk.vtkStripper()
+    stripper.SetInputConnection(contour.GetOutputPort())
+    stripper.JoinContiguousSegmentsOn()
+    stripper.Update()
+
+    polydata = stripper.GetOutput()
+    if polydata.GetNumberOfPoints() == 0:
+        return []
+
+    points = vtk_to_numpy(polydata.GetPoints().GetData())[:, :2]
+    lines = vtk_to_numpy(polydata.GetLines().GetData())
+
+    rings = []
+    i = 0
+    while i < lines.size:
+        n = lines[i]
+        ids = lines[i + 1:i + 1 + n]
+        if n > 1 and ids[0] == ids[-1]:
+            ids = ids[:-1]  # closed polylines repeat the first point
+        rings.append(points[ids])
+        i += n + 1
+
+    # the contours do not cross, so a polygon inside an odd number of others is a hole
+    boxes = np.array([[ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max()] for ring in rings])
+    polygons = []
+    for i, ring in enumerate(rings):
+        x, y = ring[0]
+        around = np.nonzero((boxes[:, 0] < x) & (x < boxes[:, 2]) & (boxes[:, 1] < y) & (y < boxes[:, 3]))[0]
+        hole = sum(point_in_polygon(x, y, rings[j]) for j in around if j != i) % 2 == 1
+
+        # the stripper keeps the order of the segments, which is arbitrary
+        if (polygon_signed_area(ring) < 0) != hole:
+            ring = ring[::-1]
+        polygons.append({"points": ring.tolist(), "hole": bool(hole)})
+    return polygons
+
+def polygon_signed_area(points):
+    """Signed area of a polygon given as an (n, 2) array of [x, y] (positive if counterclockwise)."""
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+def point_in_polygon(x, y, points):
+    """True if (x, y) is inside the polygon given as an (n, 2) array of [x, y] (even-odd rule)."""
+    x0, y0 = points[:, 0], points[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    crossing = (y0 > y) != (y1 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return bool(np.count_nonzero(crossing & (x < x_cross)) % 2)
@@ -1,6 +1,6 @@
 import vtk
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QSlider, QLabel, QHBoxLayout
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from vtk.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
 
 from PyQt5.QtWidgets import (
@@ -10,8 +10,12 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtWidgets import QWidget, QHBoxLayout, QCheckBox, QLabel, QListWidgetItem, QColorDialog
 from PyQt5.QtGui import QPixmap, QImage, QPainter, QColor, QPen, QIcon
 
-from logger import logger
+from logger import logger, trace, set_trace_level, is_trace_enabled
+from orientation import Orientation, ROT_PLUS_90, ROT_MINUS_90, FLIP_X, FLIP_Y
 
+import time
+import logging
+import numpy as np
 
 class Panning:
     def __init__(self, viewer=None):
@@ -55,8 +59,6 @@ class Panning:
         if self.left_button_is_pressed:
             self.perform_panning()
 
-        self.viewer.render_window.Render()
-
     def on_left_button_release(self, obj, event):
         if not self.enabled:
             return
@@ -75,16 +77,9 @@ class Panning:
             # Get the camera and renderer
             camera = renderer.GetActiveCamera()
 
-            # Convert mouse positions to world coordinates
-            picker = vtk.vtkWorldPointPicker()
-
-            # Pick world coordinates for the last mouse position
-            picker.Pick(self.last_mouse_position[0], self.last_mouse_position[1], 0, renderer)
-            last_world_position = picker.GetPickPosition()
-
-            # Pick world coordinates for the current mouse position
-            picker.Pick(current_mouse_position[0], current_mouse_position[1], 0, renderer)
-            current_world_position = picker.GetPickPosition()
+            # Convert the last and current mouse positions to world coordinates
+            last_world_position, current_world_position = self.viewer.coordinates.display_to_world(
+                [self.last_mouse_position, current_mouse_position])
 
             # Compute the delta in world coordinates
             delta_world = [
@@ -93,6 +88,9 @@ class Panning:
                 last_world_position[2] - current_world_position[2],
             ]
 
+            # the camera looks at the oriented image, move it in the displayed directions
+            delta_world = self.viewer.orientation.transform_vector(delta_world)
+
             # Update the camera position and focal point
             camera.SetFocalPoint(
                 camera.GetFocalPoint()[0] + delta_world[0],
@@ -106,7 +104,7 @@ class Panning:
             )
 
             # Render the updated scene
-            self.viewer.render_window.Render()
+            self.viewer.request_render()
 
         # Update the last mouse position
         self.last_mouse_position = current_mouse_position
@@ -138,29 +136,25 @@ class Zooming:
 
         self.zoom_in()        
 
-        self.viewer.render_window.Render()
-
     def on_mouse_wheel_backward(self, obj, event):
         if not self.enabled:
             return
 
         self.zoom_out()
 
-        self.viewer.render_window.Render()
-
     def zoom_in(self):
         """Zoom in the camera."""
         camera = self.viewer.get_renderer().GetActiveCamera()
         camera.Zoom(self.zoom_in_factor)  
         
-        self.viewer.get_render_window().Render()
+        self.viewer.request_render()
 
     def zoom_out(self):
         """Zoom out the camera."""
         camera = self.viewer.get_renderer().GetActiveCamera()
         camera.Zoom(self.zoom_out_factor)  
         
-        self.viewer.get_render_window().Render()
+        self.viewer.request_render()
 
     def zoom_reset(self):
         # Get the active camera
@@ -177,7 +171,83 @@ class Zooming:
             self.viewer.get_renderer().ResetCameraClippingRange()
 
         # Render the updated scene
-        self.viewer.get_render_window().Render()
+        self.viewer.request_render()
+
+class CoordinateService:
+    """
+    Display/world/image index conversions for a VTKViewer.
+    Owns a single world point picker and caches the geometry of the viewer image
+    (the cache is invalidated by VTKViewer.set_vtk_image() and clear(), or by calling invalidate()).
+    """
+    def __init__(self, viewer=None):
+        self.viewer = viewer
+        self.picker = vtk.vtkWorldPointPicker()
+        self.geometry = None
+
+    def invalidate(self):
+        """Drop the cached image geometry (call when the dimensions/spacing/origin of the image change)."""
+        self.geometry = None
+
+    def get_geometry(self):
+        """Return (dims, spacing, origin) of the viewer image as NumPy arrays, or None if no image is loaded."""
+        if self.geometry is None:
+            vtk_image = self.viewer.vtk_image
+            if vtk_image is None:
+                return None
+
+            self.geometry = (
+                np.array(vtk_image.GetDimensions()),
+                np.array(vtk_image.GetSpacing()),
+                np.array(vtk_image.GetOrigin()),
+            )
+        return self.geometry
+
+    def pick(self, display_x, display_y):
+        """World position under a display position (uses the z-buffer, like vtkWorldPointPicker)."""
+        self.picker.Pick(display_x, display_y, 0, self.viewer.get_renderer())
+        return self.picker.GetPickPosition()
+
+    def display_to_world(self, display_points):
+        """
+        Convert display points (N, 2) to world points (N, 3) on the focal plane of the camera.
+        The viewer uses a parallel projection, so the mapping is affine and is evaluated once for all points.
+        """
+        renderer = self.viewer.get_renderer()
+
+        # display depth of the focal plane
+        focal_point = renderer.GetActiveCamera().GetFocalPoint()
+        renderer.SetWorldPoint(focal_point[0], focal_point[1], focal_point[2], 1.0)
+        renderer.WorldToDisplay()
+        depth = renderer.GetDisplayPoint()[2]
+
+        # world positions of the display origin and unit x/y steps
+        basis = []
+        for x, y in ((0.0, 0.0), (1.0, 0.0), (0.0, 1.0)):
+            renderer.SetDisplayPoint(x, y, depth)
+            renderer.DisplayToWorld()
+            world = renderer.GetWorldPoint()
+            basis.append(np.array(world[:3]) / world[3])
+
+        display_points = np.asarray(display_points, dtype=float).reshape(-1, 2)
+        return (basis[0] 
+                + display_points[:, 0:1] * (basis[1] - basis[0]) 
+                + display_points[:, 1:2] * (basis[2] - basis[0]))
+
+    def world_to_index(self, world_points):
+        """Convert world points (3,) or (N, 3) to the nearest image indices (same shape, int)."""
+        _, spacing, origin = self.get_geometry()
+        return np.floor((np.asarray(world_points) - origin) / spacing + 0.5).astype(int)
+
+    def is_inside(self, index):
+        """True for image indices (3,) or (N, 3) that are within the image."""
+        dims = self.get_geometry()[0]
+        index = np.asarray(index)
+        return np.all((index >= 0) & (index < dims), axis=-1)
+
+    def display_to_index(self, display_points):
+        """Convert display points (N, 2) to image indices (N, 3)."""
+        return self.world_to_index(self.display_to_world(display_points))
+
 
 class LineWidget:
     def __init__(self, vtk_image, pt1_w, pt2_w, line_color_vtk=[1,0,0], line_width=2, renderer=None):
@@ -243,7 +313,7 @@ class LineWidget:
                     (point2[1] - point1[1]) ** 2 +
                     (point2[2] - point1[2]) ** 2) ** 0.5
 
-        print(f"Ruler Distance: {distance:.2f} mm")
+        trace("Ruler Distance: %.2f mm", distance)
 
         # Update the text actor position 
         midpoint_w = [(point1[i] + point2[i]) / 2 for i in range(3)]
@@ -300,6 +370,17 @@ class VTKViewer(QWidget):
 
         self.zooming = Zooming(viewer=self)
         self.panning = Panning(viewer=self)  
+        self.coordinates = CoordinateService(viewer=self)
+
+        # Display orientation (rotations/flips), applied through the camera model transform
+        self.orientation = Orientation()
+
+        # Render scheduler: render requests are collapsed into one render per frame
+        self.max_fps = 60
+        self.last_render_time = 0.0
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render)
 
     def clear(self):
         # Remove the previous image actor if it exists
@@ -308,6 +389,8 @@ class VTKViewer(QWidget):
             self.image_actor = None
 
         self.vtk_image = None
+        self.coordinates.invalidate()
+        self.set_orientation(Orientation(), reset_camera=False)
 
         self.render()
 
@@ -324,6 +407,7 @@ class VTKViewer(QWidget):
         self.clear()
 
         self.vtk_image = vtk_image
+        self.coordinates.invalidate()
                 
         # Connect reader to window/level filter
         self.window_level_filter = vtk.vtkImageMapToWindowLevelColors()
@@ -342,6 +426,25 @@ class VTKViewer(QWidget):
 
         self.get_render_window().Render()
 
+    def set_orientation(self, orientation, reset_camera=True):
+        """Display the image (and everything on it) with the given Orientation. No pixels are changed."""
+        self.orientation = orientation
+        camera = self.get_renderer().GetActiveCamera()
+
+        if self.vtk_image is None or orientation.is_identity():
+            camera.SetModelTransformMatrix(vtk.vtkMatrix4x4())
+        else:
+            # rotate/flip about the image center, so the image stays in place
+            dims = self.vtk_image.GetDimensions()
+            spacing = self.vtk_image.GetSpacing()
+            origin = self.vtk_image.GetOrigin()
+            center = [origin[i] + (dims[i] - 1) * spacing[i] / 2.0 for i in range(3)]
+            camera.SetModelTransformMatrix(orientation.get_model_transform(center))
+
+        if reset_camera:
+            self.get_renderer().ResetCamera()
+        self.request_render()
+
     def get_renderer(self):
         return self.base_renderer
     
@@ -435,49 +538,32 @@ class VTKViewer(QWidget):
 
     def on_mouse_move(self, obj, event):
         self.print_mouse_coordiantes()
-        self.render_window.Render()
+        self.request_render()
 
     def print_mouse_coordiantes(self):
         """Update brush position and print mouse position details when inside the image."""
         mouse_pos = self.interactor.GetEventPosition()
 
-        # Use a picker to get world coordinates
-        picker = vtk.vtkWorldPointPicker()
-        picker.Pick(mouse_pos[0], mouse_pos[1], 0, self.get_renderer())
-
-        # Get world position
-        world_pos = picker.GetPickPosition()
-
-        # Check if the world position is valid
-        if not picker.GetPickPosition():
-            print("Mouse is outside the render area.")
-            return
-
         # Get the image data
         vtk_image = self.vtk_image
         if not vtk_image:
-            print("No image loaded.")
+            trace("No image loaded.")
             return
 
-        # Get image properties
-        dims = vtk_image.GetDimensions()
-        spacing = vtk_image.GetSpacing()
-        origin = vtk_image.GetOrigin()
+        # Get world position
+        world_pos = self.coordinates.pick(mouse_pos[0], mouse_pos[1])
 
         # Convert world coordinates to image index
-        image_index = [
-            int((world_pos[0] - origin[0]) / spacing[0] + 0.5),
-            int((world_pos[1] - origin[1]) / spacing[1] + 0.5),
-            int((world_pos[2] - origin[2]) / spacing[2] + 0.5)
-        ]
+        image_index = self.coordinates.world_to_index(world_pos)
 
         # Check if the index is within bounds
-        if not (0 <= image_index[0] < dims[0] and 0 <= image_index[1] < dims[1] and 0 <= image_index[2] < dims[2]):
+        if not self.coordinates.is_inside(image_index):
             # Print details
             self.print_status(f"Point - World: ({world_pos[0]:.2f}, {world_pos[1]:.2f}))")
             return
 
         # Get the pixel value
+        dims = self.coordinates.get_geometry()[0]
         scalars = vtk_image.GetPointData().GetScalars()
         flat_index = image_index[2] * dims[0] * dims[1] + image_index[1] * dims[0] + image_index[0]
         pixel_value = scalars.GetTuple1(flat_index)
@@ -601,7 +687,7 @@ class VTKViewer(QWidget):
         """Toggle the visibility of the base image."""
         self.base_image_visible = visible
         self.image_actor.SetVisibility(self.base_image_visible)
-        self.render_window.Render()
+        self.request_render()
 
     def toggle_panning_mode(self, checked):
         """Enable or disable panning mode."""
@@ -618,8 +704,19 @@ class VTKViewer(QWidget):
         self.render_window.Render()
 
     def render(self):
+        # a direct render also satisfies any pending request
+        self.render_timer.stop()
+        self.last_render_time = time.perf_counter()
         self.get_render_window().Render()
 
+    def request_render(self):
+        """Schedule a render. All requests made before it runs are collapsed into one, at most max_fps renders per second."""
+        if self.render_timer.isActive():
+            return
+        
+        delay = self.last_render_time + 1.0 / self.max_fps - time.perf_counter()
+        self.render_timer.start(max(0, int(delay * 1000)))
+
 
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QListWidget, QPushButton, QToolButton, QHBoxLayout
 import os
@@ -660,6 +757,10 @@ from vtk_line_list_manager import LineListManager
 from vtk_rect_list_manager import RectListManager
 
 class MainWindow(QMainWindow):
+    # emitted by the save worker thread, delivered on the GUI thread
+    save_progress = pyqtSignal(int, int, str)  # done, total, file path
+    save_done = pyqtSignal(str, str, str)  # workspace json path, data folder, error message ('' on success)
+
     def __init__(self):
         super().__init__()
 
@@ -667,6 +768,21 @@ class MainWindow(QMainWindow):
         self.exclusive_actions = []
         self.managers = []
         self.vtk_image = None
+        self.orientation_modified = False
+
+        # workspace data folder the current image was loaded from/saved to (its input image file is up to date)
+        self.workspace_data_dir = None
+
+        # workspace save: the files are written on a worker thread from a snapshot, one save at a time
+        self.background_save = settings.value("background_save", True, type=bool)
+        self.saving = False
+        self.save_thread = None
+        self.save_image = None  # image of the workspace being saved
+        self.save_failed = False
+        self.close_requested = False  # the window was closed during a background save
+        self.close_workspace_requested = False  # the workspace was closed during a background save
+        self.save_progress.connect(self.on_save_progress)
+        self.save_done.connect(self.on_save_done)
 
         ### init ui ###    
         self.setWindowTitle("Image Labeler 2D")
@@ -775,6 +891,11 @@ class MainWindow(QMainWindow):
         self.status_bar = self.statusBar()
         self.status_bar.showMessage("Ready")  # Initial message
 
+        # shown while a workspace save is running
+        self.save_indicator = QLabel("")
+        self.status_bar.addPermanentWidget(self.save_indicator)
+        self.save_indicator.hide()
+
         logger.info("MainWindow initialized")
 
         # Load a sample DICOM file
@@ -800,9 +921,16 @@ class MainWindow(QMainWindow):
         """
         Override the closeEvent to log application or window close.
         """
-        logger.info("MainWindow is closing.")
+        # let a background save complete first, so its files are not left half written and a failure is reported;
+        # the window is closed again from on_save_done()
+        if self.saving:
+            logger.info("Waiting for the workspace save to complete before closing.")
+            self.close_requested = True
+            self.save_indicator.setText("Finishing the workspace save, the window closes when it is done...")
+            event.ignore()
+            return
 
-        
+        logger.info("MainWindow is closing.")
 
         super().closeEvent(event)  # Call the base class method to ensure proper behavior
 
@@ -878,6 +1006,10 @@ class MainWindow(QMainWindow):
         file_menu = menubar.addMenu("File")
         self.create_file_menu(file_menu)
 
+        # Add Edit menu
+        edit_menu = menubar.addMenu("Edit")
+        self.create_edit_menu(edit_menu)
+
         # Add View menu
         view_menu = menubar.addMenu("View")
         self.create_view_menu(view_menu)
@@ -901,6 +1033,13 @@ class MainWindow(QMainWindow):
         save_workspace_action.triggered.connect(self.save_workspace)
         file_menu.addAction(save_workspace_action)
 
+        # Write the workspace files on a worker thread
+        background_save_action = QAction("Save in Background", self)
+        background_save_action.setCheckable(True)
+        background_save_action.setChecked(self.background_save)
+        background_save_action.toggled.connect(self.toggle_background_save)
+        file_menu.addAction(background_save_action)
+
         # Add Open Image action
         close_image_action = QAction("Close Workspace", self)
         close_image_action.triggered.connect(self.close_workspace)
@@ -911,6 +1050,22 @@ class MainWindow(QMainWindow):
         print_objects_action.triggered.connect(self.vtk_viewer.print_properties)
         file_menu.addAction(print_objects_action)
         
+    def create_edit_menu(self, edit_menu):
+
+        from PyQt5.QtWidgets import QAction
+        from PyQt5.QtGui import QKeySequence
+
+        # Undo/Redo of the segmentation paint and erase strokes
+        undo_action = QAction("Undo", self)
+        undo_action.setShortcut(QKeySequence.Undo)
+        undo_action.triggered.connect(lambda: self.segmentation_list_manager.undo())
+        edit_menu.addAction(undo_action)
+
+        redo_action = QAction("Redo", self)
+        redo_action.setShortcut(QKeySequence.Redo)
+        redo_action.triggered.connect(lambda: self.segmentation_list_manager.redo())
+        edit_menu.addAction(redo_action)
+
     def create_managers_menu(self, view_menu):
         self.managers_menu = view_menu.addMenu("Managers")
 
@@ -940,6 +1095,21 @@ class MainWindow(QMainWindow):
         toggle_image_button.triggered.connect(self.vtk_viewer.toggle_base_image)
         view_menu.addAction(toggle_image_button)
 
+        # Debug trace of the interactive tools (mouse, paint, drag) to the log
+        debug_trace_action = QAction("Debug Trace", self)
+        debug_trace_action.setCheckable(True)
+        debug_trace_action.setChecked(is_trace_enabled())
+        debug_trace_action.toggled.connect(self.toggle_debug_trace)
+        view_menu.addAction(debug_trace_action)
+
+    def toggle_background_save(self, checked):
+        self.background_save = checked
+        settings.setValue("background_save", checked)
+
+    def toggle_debug_trace(self, checked):
+        set_trace_level(logging.DEBUG if checked else None)
+        self.print_status(f"Debug trace {'enabled' if checked else 'disabled'}")
+
 
     def create_file_toolbar(self):
         # Create a toolbar
@@ -1038,115 +1208,26 @@ class MainWindow(QMainWindow):
         toolbar.addAction(add_ruler_action)
 
     def rotate_plus_90_clicked(self):
-        
-        if self.vtk_image is None:
-            self.show_popup("Error", "Open an image first.")
-            return 
-
-        # Get image properties
-        # dims = self.vtk_image.GetDimensions()
-        # spacing = self.vtk_image.GetSpacing()
-        # original_origin = self.vtk_image.GetOrigin()
-        # direction = self.vtk_image.GetDirectionMatrix()
-        # print('dims: ', dims)
-        # print('spacing: ', spacing)
-        # print('original_origin: ', original_origin)
-        # print('direction: ', direction)
-
-        # to itk image
-        from itkvtk import vtk_to_sitk, sitk_to_vtk
-        sitk_image = vtk_to_sitk(self.vtk_image)
-
-        # rot 90
-        from itk import rot90
-        sitk_image_rotated = rot90(sitk_image, plus=True)
-
-        # back to vtk image
-        self.vtk_image = sitk_to_vtk(sitk_image_rotated)
-
-       # Get image properties
-        # dims = self.vtk_image.GetDimensions()
-        # spacing = self.vtk_image.GetSpacing()
-        # original_origin = self.vtk_image.GetOrigin()
-        # direction = self.vtk_image.GetDirectionMatrix()
-        # print('dims: ', dims)
-        # print('spacing: ', spacing)
-        # print('original_origin: ', original_origin)
-        # print('direction: ', direction)
-
-        # set image
-        self.vtk_viewer.set_vtk_image(self.vtk_image, self.range_slider.get_width()/4, self.range_slider.get_center())
-        
-        self.vtk_viewer.render()
+        self.apply_orientation(ROT_PLUS_90)
 
     def rotate_minus_90_clicked(self):
-        
-        if self.vtk_image is None:
-            self.show_popup("Error", "Open an image first.")
-            return 
-
-        # to itk image
-        from itkvtk import vtk_to_sitk, sitk_to_vtk
-        sitk_image = vtk_to_sitk(self.vtk_image)
-
-        # rot 90
-        from itk import rot90
-        sitk_image_rotated = rot90(sitk_image, plus=False)
-
-        # back to vtk image
-        self.vtk_image = sitk_to_vtk(sitk_image_rotated)
-
-        # set image
-        self.vtk_viewer.set_vtk_image(self.vtk_image, self.range_slider.get_width()/4, self.range_slider.get_center())
-        
-        self.vtk_viewer.render()
+        self.apply_orientation(ROT_MINUS_90)
 
     def flip_x_clicked(self):
-        
-        if self.vtk_image is None:
-            self.show_popup("Error", "Open an image first.")
-            return 
-
-        # to itk image
-        from itkvtk import vtk_to_sitk, sitk_to_vtk
-        sitk_image = vtk_to_sitk(self.vtk_image)
-
-        # rot 90
-        from itk import flip_x
-        sitk_image_flipped = flip_x(sitk_image)
-
-        # back to vtk image
-        self.vtk_image = sitk_to_vtk(sitk_image_flipped)
-
-        # set image
-        self.vtk_viewer.set_vtk_image(self.vtk_image, self.range_slider.get_width()/4, self.range_slider.get_center())
-        
-        self.vtk_viewer.render()
-
+        self.apply_orientation(FLIP_X)
 
     def flip_y_clicked(self):
-        
+        self.apply_orientation(FLIP_Y)
+
+    def apply_orientation(self, operation):
+        """Rotate/flip the displayed image, the layers and the annotations. Only the display orientation changes;
+        pixels are reordered when the image is exported."""
         if self.vtk_image is None:
             self.show_popup("Error", "Open an image first.")
             return 
 
-        # to itk image
-        from itkvtk import vtk_to_sitk, sitk_to_vtk
-        sitk_image = vtk_to_sitk(self.vtk_image)
-
-        # rot 90
-        from itk import flip_y
-        sitk_image_flipped = flip_y(sitk_image)
-
-        # back to vtk image
-        self.vtk_image = sitk_to_vtk(sitk_image_flipped)
-
-        # set image
-        self.vtk_viewer.set_vtk_image(self.vtk_image, self.range_slider.get_width()/4, self.range_slider.get_center())
-        
-        self.vtk_viewer.render()
-
-
+        self.vtk_viewer.set_orientation(self.vtk_viewer.orientation.apply(operation))
+        self.orientation_modified = True
 
     def update_window_level(self):
         if self.vtk_image is not None:
@@ -1156,7 +1237,7 @@ class MainWindow(QMainWindow):
 
             self.vtk_viewer.window_level_filter.SetWindow(window)
             self.vtk_viewer.window_level_filter.SetLevel(level)
-            self.vtk_viewer.get_render_window().Render()
+            self.vtk_viewer.request_render()
 
             self.print_status(f"Window: {window}, Level: {level}")
 
@@ -1252,7 +1333,8 @@ class MainWindow(QMainWindow):
             self.range_slider.update()  
             
             self.vtk_viewer.set_vtk_image(self.vtk_image, self.range_slider.get_width()/4, self.range_slider.get_center())
-
+            self.orientation_modified = False
+            self.workspace_data_dir = None
 
             self.setWindowTitle(f"Image Labeler 2D - {os.path.basename(file_path)}")
             
@@ -1263,6 +1345,9 @@ class MainWindow(QMainWindow):
 
 
     def modified(self):
+        if self.orientation_modified or self.save_failed:
+            return True
+
         for manager in self.managers:
             if manager.modified():
                 return True
@@ -1293,16 +1378,36 @@ class MainWindow(QMainWindow):
             self.show_popup("Close Image", "No image has been loaded.")
             return 
 
+        # a background save completes first, a failure is reported while the workspace is still open;
+        # the workspace is closed again from on_save_done()
+        if self.saving:
+            logger.info("Waiting for the workspace save to complete before closing the workspace.")
+            self.close_workspace_requested = True
+            self.save_indicator.setText("Finishing the workspace save, the workspace closes when it is done...")
+            return
+
         if self.modified():
             yes = self.show_yes_no_question_dialog("Save Workspace", "There are modified objects. Do you want to save the workspace?")
 
             if yes:
                 self.save_workspace()
+
+                if self.saving:
+                    self.close_workspace_requested = True
+                    return
+
+                # the save was canceled or failed
+                if self.modified():
+                    self.print_status("The workspace was not saved, it is not closed.")
+                    return
         
         for manager in self.managers:
             manager.clear()
 
         self.vtk_viewer.clear()
+        self.orientation_modified = False
+        self.save_failed = False
+        self.workspace_data_dir = None
 
 
      
@@ -1323,6 +1428,10 @@ class MainWindow(QMainWindow):
             self.print_status("No image loaded. Cannot save workspace.")
             return
 
+        if self.saving:
+            self.print_status("A workspace save is in progress. Try again when it has completed.")
+            return
+
         # workspace json file
         workspace_json_path, _ = QFileDialog.getSaveFileName(self, "Save Workspace", "", "Json (*.json)")
         if not workspace_json_path:
@@ -1346,36 +1455,125 @@ class MainWindow(QMainWindow):
                     "width": self.range_slider.get_width(),
                     "range_min" : self.range_slider.range_min,
                     "range_max" : self.range_slider.range_max
-                }
+                },
+                # display orientation, the saved images are not rotated/flipped
+                "orientation": self.vtk_viewer.orientation.to_list()
             }
 
-            # Save input image as '.mha'
+            # files to write: they are encoded, compressed and written concurrently
+            jobs = []
+
+            # Save input image as '.mhd' (the image is never edited, it is only written to a new folder)
             from itkvtk import save_vtk_image_using_sitk
+            from workspace_io import atomic_write, run_save_jobs, is_same_path
             input_image_path = os.path.join(data_dir, "input_image.mhd")
-            save_vtk_image_using_sitk(self.vtk_image, input_image_path)
-            logger.info(f"Saved input image to {input_image_path}")
+            if is_same_path(data_dir, self.workspace_data_dir) and os.path.exists(input_image_path):
+                logger.info(f"Input image is unchanged, skipped {input_image_path}")
+            else:
+                vtk_image = self.vtk_image
+                jobs.append((input_image_path, lambda path: save_vtk_image_using_sitk(vtk_image, path)))
             
             logger.info('Saving manager states')
             for manager in self.managers:
                 logger.info(f'{manager} - Saving state')
-                manager.save_state(workspace_data, data_dir)
+                if hasattr(manager, 'prepare_save'):
+                    jobs += manager.prepare_save(workspace_data, data_dir)
+                else:
+                    manager.save_state(workspace_data, data_dir)
 
-            # Save metadata as 'workspace.json'
-            with open(workspace_json_path, "w") as f:
-                json.dump(workspace_data, f, indent=4)
-            
-            # clear the modifed flags of managers
+            # the jobs write snapshots of the layers: the workspace can be edited while they run
             for manager in self.managers:
                 manager.reset_modified()
-            
-            logger.info(f"Workspace metadata saved to {workspace_json_path}.")
-            self.print_status(f"Workspace saved to {workspace_json_path}.")
-            self.show_popup("Save Workspace", "Workspace saved successfully.", QMessageBox.Information)
+            self.orientation_modified = False
+
+            # Save metadata as 'workspace.json', after the data files
+            def write_json(path):
+                with open(path, "w") as f:
+                    json.dump(workspace_data, f, indent=4)
+
+            def save():
+                run_save_jobs(jobs, lambda done, total, file_path: self.save_progress.emit(done, total, file_path))
+                atomic_write(workspace_json_path, write_json)
+
+            self.start_save(save, workspace_json_path, data_dir)
         except Exception as e:
             logger.error(f"Failed to save workspace: {e}", exc_info=True)
             self.print_status("Failed to save workspace. Check logs for details.")
             self.show_popup("Save Workspace", f"Error saving workspace: {str(e)}", QMessageBox.Critical)      
 
+    def start_save(self, save_fn, workspace_json_path, data_dir):
+        """
+        Run save_fn on a worker thread (on the GUI thread if background saving is off).
+        on_save_done() is called on the GUI thread when it has completed.
+        """
+        import threading
+
+        self.saving = True
+        self.save_image = self.vtk_image
+        self.save_indicator.setText("Saving workspace...")
+        self.save_indicator.show()
+
+        def run():
+            error = ""
+            try:
+                save_fn()
+            except Exception as e:
+                logger.error(f"Failed to save workspace: {e}", exc_info=True)
+                error = str(e) or type(e).__name__
+            self.save_done.emit(workspace_json_path, data_dir, error)
+
+        if self.background_save:
+            self.save_thread = threading.Thread(target=run, name="save_workspace")
+            self.save_thread.start()
+        else:
+            run()
+
+    def on_save_progress(self, done, total, file_path):
+        self.save_indicator.setText(f"Saving workspace... {done}/{total}")
+        logger.debug(f"Saved {file_path} ({done}/{total})")
+        if self.save_thread is None:
+            self.save_indicator.repaint()  # the event loop is not running during a synchronous save
+
+    def on_save_done(self, workspace_json_path, data_dir, error):
+        if self.save_thread is not None:
+            self.save_thread.join()
+        self.saving = False
+        self.save_thread = None
+        self.save_indicator.hide()
+
+        # the workspace may have been closed or replaced while it was saved
+        same_workspace = self.vtk_image is not None and self.vtk_image is self.save_image
+        self.save_image = None
+        if same_workspace:
+            for manager in self.managers:
+                if hasattr(manager, 'save_finished'):
+                    manager.save_finished(data_dir, not error)
+            self.workspace_data_dir = None if error else data_dir
+            self.save_failed = bool(error)
+
+        close_requested = self.close_requested
+        self.close_requested = False
+        close_workspace_requested = self.close_workspace_requested
+        self.close_workspace_requested = False
+
+        if error:
+            self.print_status("Failed to save workspace. Check logs for details.")
+            self.show_popup("Save Workspace", f"Error saving workspace: {error}", QMessageBox.Critical)
+            if close_requested and self.show_yes_no_question_dialog("Close", "The workspace was not saved. Close anyway?"):
+                self.close()
+            elif close_workspace_requested:
+                self.print_status("The workspace was not saved, it is not closed.")
+            return
+
+        logger.info(f"Workspace metadata saved to {workspace_json_path}.")
+        self.print_status(f"Workspace saved to {workspace_json_path}.")
+        if close_requested:
+            self.close()
+        elif close_workspace_requested:
+            self.close_workspace()
+        elif not self.background_save:
+            self.show_popup("Save Workspace", "Workspace saved successfully.", QMessageBox.Information)
+
     def open_workspace(self):
         import json
         import os
@@ -1407,14 +1605,26 @@ class MainWindow(QMainWindow):
             #self.point_list_manager.points.clear()
 
             from itkvtk import load_vtk_image_using_sitk
+            from workspace_io import run_load_jobs
 
-            # Load input image
+            # files to read: the input image and the layer files needed up front are decoded concurrently,
+            # the managers then attach them on this (GUI) thread
             input_image_path = os.path.join(data_path, "input_image.mhd")
-            if os.path.exists(input_image_path):
-                self.vtk_image = load_vtk_image_using_sitk(input_image_path)
-                logger.info(f"Loaded input image from {input_image_path}.")
-            else:
+            if not os.path.exists(input_image_path):
                 raise FileNotFoundError(f"Input image file not found at {input_image_path}")
+            jobs = [(input_image_path, load_vtk_image_using_sitk)]
+            for manager in self.managers:
+                if hasattr(manager, 'prepare_load'):
+                    jobs += manager.prepare_load(workspace_data, data_path)
+
+            self.print_status(f"Loading workspace... ({len(jobs)} files)")
+            loaded = run_load_jobs(jobs)
+
+            # Load input image
+            if isinstance(loaded[input_image_path], Exception):
+                raise loaded[input_image_path]
+            self.vtk_image = loaded[input_image_path]
+            logger.info(f"Loaded input image from {input_image_path}.")
 
             # Restore window settings
             window_settings = workspace_data.get("window_settings", {})
@@ -1431,15 +1641,18 @@ class MainWindow(QMainWindow):
             self.range_slider.update()  
 
             self.vtk_viewer.set_vtk_image(self.vtk_image, window, level)
+            self.vtk_viewer.set_orientation(Orientation.from_list(workspace_data.get("orientation")))
+            self.orientation_modified = False
 
             logger.info('loading manager states')
             for manager in self.managers:
                 logger.info(f'{manager} - Loading state')
-                manager.load_state(workspace_data, data_path, {'base_image': self.vtk_image})
+                manager.load_state(workspace_data, data_path, {'base_image': self.vtk_image, 'loaded': loaded})
 
             # clear the modifed flags of managers
             for manager in self.managers:
                 manager.reset_modified()
+            self.workspace_data_dir = data_path
 
             self.print_status(f"Workspace loaded from {data_path}.")
             logger.info("Loaded workspace successfully.")
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+
+
+def is_same_path(path1, path2):
+    """True if two paths name the same file or folder, however they are spelled (relative, symlinked, case on Windows)."""
+    if path1 is None or path2 is None:
+        return False
+    return os.path.normcase(os.path.realpath(path1)) == os.path.normcase(os.path.realpath(path2))
+
+
+def atomic_write(file_path, write_fn):
+    """
+    Write a file atomically. write_fn(temp_path) writes the file into a temporary folder next to file_path, then the
+    written files are moved over their targets with os.replace(). Files written along with it (the data file of an
+    .mhd header) are moved too, before the file itself, so an interrupted save never leaves a partial file at file_path.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    name = os.path.basename(file_path)
+    temp_dir = tempfile.mkdtemp(prefix=".saving_", dir=directory)
+    try:
+        write_fn(os.path.join(temp_dir, name))
+
+        written = sorted(os.listdir(temp_dir), key=lambda written_name: written_name == name)
+        for written_name in written:
+            os.replace(os.path.join(temp_dir, written_name), os.path.join(directory, written_name))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def run_save_jobs(jobs, progress=None, max_workers=None):
+    """
+    Run save jobs, (file_path, write_fn) pairs, concurrently in a thread pool. Each job is written with atomic_write().
+    The encoding and compression of SimpleITK/zlib release the GIL, so the jobs run in parallel on multiple cores.
+
+    progress(done, total, file_path) is called on the calling thread as the jobs complete.
+    The first failed job raises its exception once the others have completed.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    if not jobs:
+        return
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(atomic_write, file_path, write_fn): file_path for file_path, write_fn in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            if future.exception() is not None:
+                errors.append(future.exception())
+            if progress is not None:
+                progress(done, len(jobs), futures[future])
+
+    if errors:
+        raise errors[0]
+
+
+def run_load_jobs(jobs, max_workers=None):
+    """
+    Run load jobs, (file_path, read_fn) pairs, concurrently in a thread pool (as run_save_jobs(), the decoding and
+    decompression release the GIL). Returns a dict file_path -> read_fn(file_path), or the exception the job raised,
+    so that the caller decides which failures are fatal.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = {}
+    if not jobs:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {file_path: executor.submit(read_fn, file_path) for file_path, read_fn in jobs}
+
+    for file_path, future in futures.items():
+        error = future.exception()
+        results[file_path] = error if error is not None else future.result()
+    return results